@@ -12,6 +12,9 @@ import { processAuthDetails } from '@/lib/iam-utils';
 import { RawIAMData } from '@/lib/types';
 import { apiService } from '@/lib/api';
 
+// Files above this size are uploaded raw to /api/uploads/bulk
+const BULK_UPLOAD_THRESHOLD_BYTES = 5 * 1024 * 1024;
+
 // UUID generation function with fallback for environments without crypto.randomUUID
 function generateUUID(): string {
   // Use crypto.randomUUID if available
@@ -63,50 +66,58 @@ export default function HomePage() {
       console.log('File size:', file.size, 'bytes');
       console.log('File name:', file.name);
       
-      const text = await file.text();
-      console.log('File text loaded, length:', text.length);
-      console.log('First 500 characters:', text.substring(0, 500));
+      let saveResult: { success: boolean; uploadId?: string; error?: string };
+      if (file.size > BULK_UPLOAD_THRESHOLD_BYTES) {
+        // Large files are sent as is; the backend parses them and loads
+        // them with COPY instead of validating a processed JSON payload
+        console.log('Large file, storing it via the bulk upload API...');
+        saveResult = await apiService.saveUploadFile(name || file.name, file);
+      } else {
+        const text = await file.text();
+        console.log('File text loaded, length:', text.length);
+        console.log('First 500 characters:', text.substring(0, 500));
       
-      console.log('Attempting to parse JSON...');
-      const data: RawIAMData = JSON.parse(text);
-      console.log('JSON parsed successfully');
-      console.log('Data structure:', {
-        UserDetailList: data.UserDetailList?.length || 0,
-        RoleDetailList: data.RoleDetailList?.length || 0,
-        Policies: data.Policies?.length || 0,
-        GroupDetailList: data.GroupDetailList?.length || 0
-      });
+        console.log('Attempting to parse JSON...');
+        const data: RawIAMData = JSON.parse(text);
+        console.log('JSON parsed successfully');
+        console.log('Data structure:', {
+          UserDetailList: data.UserDetailList?.length || 0,
+          RoleDetailList: data.RoleDetailList?.length || 0,
+          Policies: data.Policies?.length || 0,
+          GroupDetailList: data.GroupDetailList?.length || 0
+        });
       
-      console.log('Processing data with processAuthDetails...');
-      const processedData = processAuthDetails(data);
-      console.log('Data processing completed successfully');
-      console.log('Processed data structure:', {
-        users: Object.keys(processedData.users).length,
-        roles: Object.keys(processedData.roles).length,
-        policies: Object.keys(processedData.policies).length,
-        groups: Object.keys(processedData.groups).length
-      });
+        console.log('Processing data with processAuthDetails...');
+        const processedData = processAuthDetails(data);
+        console.log('Data processing completed successfully');
+        console.log('Processed data structure:', {
+          users: Object.keys(processedData.users).length,
+          roles: Object.keys(processedData.roles).length,
+          policies: Object.keys(processedData.policies).length,
+          groups: Object.keys(processedData.groups).length
+        });
       
-      // Create upload data for IndexedDB storage
-      // Use crypto.randomUUID() with fallback for environments where it's not available
-      const uploadId = generateUUID();
-      const uploadData = {
-        id: uploadId,
-        name: name || file.name,
-        originalFilename: file.name,
-        uploadedAt: new Date().toISOString(),
-        size: file.size,
-        data: processedData
-      };
-
-      console.log('Storing data via API...');
-      // Store data via API
-      const saveResult = await apiService.saveUpload(
-        uploadData.name,
-        uploadData.originalFilename,
-        uploadData.size,
-        uploadData.data
-      );
+        // Create upload data for IndexedDB storage
+        // Use crypto.randomUUID() with fallback for environments where it's not available
+        const uploadId = generateUUID();
+        const uploadData = {
+          id: uploadId,
+          name: name || file.name,
+          originalFilename: file.name,
+          uploadedAt: new Date().toISOString(),
+          size: file.size,
+          data: processedData
+        };
+
+        console.log('Storing data via API...');
+        // Store data via API
+        saveResult = await apiService.saveUpload(
+          uploadData.name,
+          uploadData.originalFilename,
+          uploadData.size,
+          uploadData.data
+        );
+      }
 
       if (!saveResult.success) {
         throw new Error(saveResult.error || 'Failed to save upload');
@@ -66,6 +66,29 @@ class ApiService {
     return { success: true, uploadId: response.data?.id };
   }
 
+  async saveUploadFile(
+    name: string,
+    file: File
+  ): Promise<{ success: boolean; uploadId?: string; error?: string }> {
+    const form = new FormData();
+    form.append('file', file);
+    form.append('name', name);
+
+    // Empty headers replace the JSON Content-Type so the browser sets the
+    // multipart boundary itself
+    const response = await this.request<{ id: string }>('/api/uploads/bulk', {
+      method: 'POST',
+      headers: {},
+      body: form,
+    });
+
+    if (response.error) {
+      return { success: false, error: response.error };
+    }
+
+    return { success: true, uploadId: response.data?.id };
+  }
+
   async getUpload(uploadId: string): Promise<{ data?: ProcessedIAMData; error?: string }> {
     return this.request<ProcessedIAMData>(`/api/uploads/${uploadId}`);
   }
@@ -0,0 +1,64 @@
+"""
+Shared Redis client and lookaside cache helpers.
+
+Redis is optional: without REDIS_URL every helper is a no-op, and callers fall
+through to the database.
+"""
+
+from typing import List, Optional
+from uuid import UUID
+
+from app.config import settings
+
+try:
+    import redis.asyncio as redis
+except Exception:  # pragma: no cover
+    redis = None  # type: ignore
+
+# One client (and connection pool) per process, shared by every cache user
+redis_client = redis.from_url(settings.redis_url) if redis is not None and settings.redis_url else None
+
+# IAM entities never change within an upload; the TTL only bounds memory
+IAM_CACHE_TTL_SECONDS = 3600
+
+
+def cache_enabled() -> bool:
+    return redis_client is not None
+
+
+def iam_key(kind: str, upload_id: UUID, entity_id: str) -> str:
+    """Cache key for one serialized IAM entity of an upload"""
+    return f"iam:{kind}:{upload_id}:{entity_id}"
+
+
+async def get_cached(key: str) -> Optional[bytes]:
+    """Get cached bytes, or None on a miss or when Redis is unavailable"""
+    if redis_client is None:
+        return None
+    try:
+        return await redis_client.get(key)
+    except Exception:
+        # The cache is an optimization; an outage degrades to a miss
+        return None
+
+
+async def set_cached(key: str, value: bytes, ttl_seconds: int = IAM_CACHE_TTL_SECONDS) -> None:
+    """Store bytes with a TTL, ignoring Redis errors"""
+    if redis_client is None:
+        return
+    try:
+        await redis_client.setex(key, ttl_seconds, value)
+    except Exception:
+        pass
+
+
+async def invalidate_upload(upload_id: UUID) -> None:
+    """Drop every cached IAM entity of an upload"""
+    if redis_client is None:
+        return
+    try:
+        keys: List[bytes] = [key async for key in redis_client.scan_iter(match=f"iam:*:{upload_id}:*", count=500)]
+        if keys:
+            await redis_client.delete(*keys)
+    except Exception:
+        pass
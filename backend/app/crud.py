@@ -1,279 +1,511 @@
-from sqlalchemy.orm import Session
-from sqlalchemy import desc
+from typing import AsyncIterator
+from uuid import UUID
+import threading
+import time
+
+import orjson
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.engine import RowMapping
+from sqlalchemy import Text, cast, delete, desc, func, literal_column, select
+from sqlalchemy.dialects.postgresql import JSONB, insert as pg_insert
 from app.models import Upload, User, Role, Policy, Group, LLMRecommendation, RecommendedPolicy, AttackPath
 from app.schemas import UploadCreate, ProcessedIAMData
 
-def create_upload(db: Session, upload_id: str, upload_data: UploadCreate) -> Upload:
+# Process-wide cache of the current upload id. Uploads change rarely compared
+# to reads, so a short TTL saves a query on every lookup that needs it.
+CURRENT_UPLOAD_TTL_SECONDS = 5.0
+_current_upload_cache: tuple[UUID | None, float] | None = None
+_current_upload_lock = threading.Lock()
+
+def _invalidate_current_upload_cache() -> None:
+    """Drop the cached current upload id after uploads change"""
+    global _current_upload_cache
+    with _current_upload_lock:
+        _current_upload_cache = None
+
+async def _copy_rows(db: AsyncSession, model, upload_id: UUID, rows: list[dict]) -> None:
+    """Load an upload's rows into a table with one COPY on the session's connection"""
+    columns = list(rows[0])
+    # COPY bypasses SQLAlchemy's type processing, so JSONB values are sent as JSON text
+    json_columns = {column.name for column in model.__table__.columns if isinstance(column.type, JSONB)}
+    records = [
+        (*(orjson.dumps(row[name]).decode() if name in json_columns else row[name] for name in columns), upload_id)
+        for row in rows
+    ]
+    connection = await db.connection()
+    raw_connection = await connection.get_raw_connection()
+    await raw_connection.driver_connection.copy_records_to_table(
+        model.__tablename__, records=records, columns=[*columns, "upload_id"]
+    )
+
+async def _store_upload(db: AsyncSession, db_upload: Upload, tables: list[tuple[type, list[dict]]]) -> Upload:
+    """Insert an upload and its resource rows (given per model, without upload_id)"""
+    # Write the upload and all of its resources in one explicit transaction
+    async with db.begin():
+        # Flushing the upload fires the id default; the row is inserted
+        # here rather than at commit, so this costs no extra round trip
+        db.add(db_upload)
+        await db.flush()
+        # One COPY per table streams every row in a single command, inside
+        # the same transaction as the upload row
+        for model, rows in tables:
+            if rows:
+                await _copy_rows(db, model, db_upload.id, rows)
+
+    _invalidate_current_upload_cache()
+    return db_upload
+
+async def create_upload(db: AsyncSession, upload_data: UploadCreate) -> Upload:
     """Create a new upload with associated IAM data"""
-    # Create the upload record
+    # Create the upload record; its id comes from the column default
     db_upload = Upload(
-        id=upload_id,
         name=upload_data.name,
         original_filename=upload_data.original_filename,
         size=upload_data.size
     )
-    db.add(db_upload)
-
-    # Create users
-    for user_id, user_data in upload_data.data.users.items():
-        db_user = User(
-            user_id=user_id,
-            user_name=user_data.UserName,
-            arn=user_data.Arn,
-            create_date=user_data.CreateDate,
-            attached_managed_policies=user_data.AttachedManagedPolicies,
-            group_list=user_data.GroupList,
-            user_policy_list=user_data.UserPolicyList,
-            tags=user_data.Tags,
-            upload_id=upload_id
-        )
-        db.add(db_user)
-
-    # Create roles
-    for role_id, role_data in upload_data.data.roles.items():
-        db_role = Role(
-            role_id=role_id,
-            role_name=role_data.RoleName,
-            arn=role_data.Arn,
-            create_date=role_data.CreateDate,
-            assume_role_policy_document=role_data.AssumeRolePolicyDocument,
-            attached_managed_policies=role_data.AttachedManagedPolicies,
-            role_policy_list=role_data.RolePolicyList,
-            tags=role_data.Tags,
-            upload_id=upload_id
-        )
-        db.add(db_role)
 
-    # Create policies
-    for policy_id, policy_data in upload_data.data.policies.items():
-        db_policy = Policy(
-            policy_id=policy_id,
-            policy_name=policy_data.PolicyName,
-            arn=policy_data.Arn,
-            create_date=policy_data.CreateDate,
-            default_version_id=policy_data.DefaultVersionId,
-            policy_version_list=policy_data.PolicyVersionList,
-            attachment_count=policy_data.AttachmentCount,
-            is_attachable=str(policy_data.IsAttachable).lower(),
-            description=policy_data.Description,
-            upload_id=upload_id
-        )
-        db.add(db_policy)
-
-    # Create groups
-    for group_id, group_data in upload_data.data.groups.items():
-        db_group = Group(
-            group_id=group_id,
-            group_name=group_data.GroupName,
-            arn=group_data.Arn,
-            create_date=group_data.CreateDate,
-            attached_managed_policies=group_data.AttachedManagedPolicies,
-            group_policy_list=group_data.GroupPolicyList,
-            upload_id=upload_id
-        )
-        db.add(db_group)
+    users = [
+        {
+            "user_id": user_id,
+            "user_name": user_data.UserName,
+            "arn": user_data.Arn,
+            "create_date": user_data.CreateDate,
+            "attached_managed_policies": user_data.AttachedManagedPolicies,
+            "group_list": user_data.GroupList,
+            "user_policy_list": user_data.UserPolicyList,
+            "tags": user_data.Tags,
+        }
+        for user_id, user_data in upload_data.data.users.items()
+    ]
 
-    db.commit()
-    db.refresh(db_upload)
-    return db_upload
+    roles = [
+        {
+            "role_id": role_id,
+            "role_name": role_data.RoleName,
+            "arn": role_data.Arn,
+            "create_date": role_data.CreateDate,
+            "assume_role_policy_document": role_data.AssumeRolePolicyDocument,
+            "attached_managed_policies": role_data.AttachedManagedPolicies,
+            "role_policy_list": role_data.RolePolicyList,
+            "tags": role_data.Tags,
+        }
+        for role_id, role_data in upload_data.data.roles.items()
+    ]
+
+    policies = [
+        {
+            "policy_id": policy_id,
+            "policy_name": policy_data.PolicyName,
+            "arn": policy_data.Arn,
+            "create_date": policy_data.CreateDate,
+            "default_version_id": policy_data.DefaultVersionId,
+            "policy_version_list": policy_data.PolicyVersionList,
+            "attachment_count": policy_data.AttachmentCount,
+            "is_attachable": policy_data.IsAttachable,
+            "description": policy_data.Description,
+        }
+        for policy_id, policy_data in upload_data.data.policies.items()
+    ]
+
+    groups = [
+        {
+            "group_id": group_id,
+            "group_name": group_data.GroupName,
+            "arn": group_data.Arn,
+            "create_date": group_data.CreateDate,
+            "attached_managed_policies": group_data.AttachedManagedPolicies,
+            "group_policy_list": group_data.GroupPolicyList,
+        }
+        for group_id, group_data in upload_data.data.groups.items()
+    ]
+
+    return await _store_upload(db, db_upload, [(User, users), (Role, roles), (Policy, policies), (Group, groups)])
+
+def _raw_rows(details: dict, list_key: str, id_key: str, build) -> list[dict]:
+    # Entries are keyed by ID like ProcessedIAMData, so a repeated ID keeps the last entry
+    entries = details.get(list_key) or []
+    if not isinstance(entries, list) or not all(isinstance(entry, dict) for entry in entries):
+        raise ValueError(f"{list_key} must be a list of objects")
+    try:
+        return list({entry[id_key]: build(entry) for entry in entries}.values())
+    except KeyError as e:
+        raise ValueError(f"{list_key} entry is missing {e}") from None
+
+async def create_upload_from_raw(
+    db: AsyncSession, name: str, original_filename: str, size: int, details: dict
+) -> Upload:
+    """Create a new upload from raw get-account-authorization-details output"""
+    # Only the document's structure is checked here; column types and NOT NULL
+    # constraints are enforced by Postgres as the rows are copied in. Optional
+    # fields get the same defaults the frontend applies when processing a file.
+    if not isinstance(details, dict):
+        raise ValueError("Expected a JSON object")
+
+    users = _raw_rows(details, "UserDetailList", "UserId", lambda user: {
+        "user_id": user["UserId"],
+        "user_name": user["UserName"],
+        "arn": user["Arn"],
+        "create_date": user["CreateDate"],
+        "attached_managed_policies": user.get("AttachedManagedPolicies") or [],
+        "group_list": user.get("GroupList") or [],
+        "user_policy_list": user.get("UserPolicyList") or [],
+        "tags": user.get("Tags") or [],
+    })
 
-def get_uploads(db: Session) -> list[Upload]:
-    """Get all uploads ordered by upload date (newest first)"""
-    return db.query(Upload).order_by(desc(Upload.uploaded_at)).all()
+    roles = _raw_rows(details, "RoleDetailList", "RoleId", lambda role: {
+        "role_id": role["RoleId"],
+        "role_name": role["RoleName"],
+        "arn": role["Arn"],
+        "create_date": role["CreateDate"],
+        "assume_role_policy_document": role.get("AssumeRolePolicyDocument") or {"Statement": []},
+        "attached_managed_policies": role.get("AttachedManagedPolicies") or [],
+        "role_policy_list": role.get("RolePolicyList") or [],
+        "tags": role.get("Tags") or [],
+    })
 
-def get_upload(db: Session, upload_id: str) -> Upload | None:
-    """Get a specific upload by ID"""
-    return db.query(Upload).filter(Upload.id == upload_id).first()
+    policies = _raw_rows(details, "Policies", "PolicyId", lambda policy: {
+        "policy_id": policy["PolicyId"],
+        "policy_name": policy["PolicyName"],
+        "arn": policy["Arn"],
+        "create_date": policy["CreateDate"],
+        "default_version_id": policy["DefaultVersionId"],
+        "policy_version_list": policy.get("PolicyVersionList") or [],
+        "attachment_count": policy["AttachmentCount"],
+        "is_attachable": policy["IsAttachable"],
+        "description": policy.get("Description") or "",
+    })
 
-def delete_upload(db: Session, upload_id: str) -> bool:
+    groups = _raw_rows(details, "GroupDetailList", "GroupId", lambda group: {
+        "group_id": group["GroupId"],
+        "group_name": group["GroupName"],
+        "arn": group["Arn"],
+        "create_date": group["CreateDate"],
+        "attached_managed_policies": group.get("AttachedManagedPolicies") or [],
+        "group_policy_list": group.get("GroupPolicyList") or [],
+    })
+
+    db_upload = Upload(name=name, original_filename=original_filename, size=size)
+    return await _store_upload(db, db_upload, [(User, users), (Role, roles), (Policy, policies), (Group, groups)])
+
+async def stream_uploads_metadata(db: AsyncSession, batch_size: int = 500) -> AsyncIterator[list[RowMapping]]:
+    """Stream upload metadata (newest first) in batches of row mappings"""
+    # Only the listed columns are fetched, batch_size rows per round trip
+    result = await db.stream(
+        select(Upload.id, Upload.name, Upload.original_filename, Upload.uploaded_at, Upload.size)
+        .order_by(desc(Upload.uploaded_at))
+        .execution_options(yield_per=batch_size)
+    )
+    async for partition in result.mappings().partitions():
+        yield partition
+
+def _json_entities_subq(model, columns: tuple, key_column):
+    # {entity_id: {Label: value, ...}} for every row of the enclosing upload;
+    # json (not jsonb) keeps the keys in column order
+    fields = []
+    for column in columns:
+        fields += [literal_column(f"'{column.name}'"), column.element]
+    return (
+        select(func.coalesce(
+            func.json_object_agg(key_column, func.json_build_object(*fields)),
+            literal_column("'{}'::json"),
+        ))
+        .where(model.upload_id == Upload.id)
+        .scalar_subquery()
+    )
+
+async def get_upload_json(db: AsyncSession, upload_id: UUID) -> str | None:
+    """Get an upload's processed IAM data as JSON text built by Postgres"""
+    payload = func.json_build_object(
+        literal_column("'users'"), _json_entities_subq(User, _USER_COLUMNS, User.user_id),
+        literal_column("'roles'"), _json_entities_subq(Role, _ROLE_COLUMNS, Role.role_id),
+        literal_column("'policies'"), _json_entities_subq(Policy, _POLICY_COLUMNS, Policy.policy_id),
+        literal_column("'groups'"), _json_entities_subq(Group, _GROUP_COLUMNS, Group.group_id),
+    )
+    # Cast to text so the driver hands back the JSON unparsed
+    return await db.scalar(select(cast(payload, Text)).where(Upload.id == upload_id))
+
+async def delete_upload(db: AsyncSession, upload_id: UUID) -> bool:
     """Delete an upload and all associated data"""
-    upload = db.query(Upload).filter(Upload.id == upload_id).first()
-    if upload:
-        db.delete(upload)
-        db.commit()
-        return True
-    return False
-
-def get_current_upload_id(db: Session) -> str | None:
+    # A single DELETE; Postgres cascades to the child tables via ON DELETE CASCADE
+    result = await db.execute(delete(Upload).where(Upload.id == upload_id))
+    await db.commit()
+    _invalidate_current_upload_cache()
+    return result.rowcount > 0
+
+async def get_current_upload_id(db: AsyncSession) -> UUID | None:
     """Get the current active upload ID from the database"""
+    global _current_upload_cache
+    with _current_upload_lock:
+        cached = _current_upload_cache
+    if cached is not None and cached[1] > time.monotonic():
+        return cached[0]
+
     # For now, we'll just return the most recent upload
     # In a more complex system, you might have a separate table for current upload
-    most_recent = db.query(Upload).order_by(desc(Upload.uploaded_at)).first()
-    return most_recent.id if most_recent else None
+    upload_id = await db.scalar(
+        select(Upload.id).order_by(desc(Upload.uploaded_at)).limit(1)
+    )
+    with _current_upload_lock:
+        _current_upload_cache = (upload_id, time.monotonic() + CURRENT_UPLOAD_TTL_SECONDS)
+    return upload_id
 
-def set_current_upload(db: Session, upload_id: str) -> bool:
+async def set_current_upload(db: AsyncSession, upload_id: UUID) -> bool:
     """Set the current active upload (placeholder implementation)"""
     # For now, this is a no-op since we're using the most recent upload
     # In a real implementation, you might update a settings table
-    upload = db.query(Upload).filter(Upload.id == upload_id).first()
+    upload = await db.get(Upload, upload_id)
+    _invalidate_current_upload_cache()
     return upload is not None
 
 # Individual IAM resource getters
-def get_user_by_id(db: Session, user_id: str) -> User | None:
+# The current upload is resolved inside the lookup query itself, so each
+# getter is a single round trip instead of two. The getters select only the
+# columns the API returns, labelled with its AWS export key names, and return
+# plain row mappings instead of ORM instances.
+_current_upload_subq = (
+    select(Upload.id).order_by(desc(Upload.uploaded_at)).limit(1).scalar_subquery()
+)
+
+_USER_COLUMNS = (
+    User.user_id.label("UserId"),
+    User.user_name.label("UserName"),
+    User.arn.label("Arn"),
+    User.create_date.label("CreateDate"),
+    User.attached_managed_policies.label("AttachedManagedPolicies"),
+    User.group_list.label("GroupList"),
+    User.user_policy_list.label("UserPolicyList"),
+    User.tags.label("Tags"),
+)
+
+_ROLE_COLUMNS = (
+    Role.role_id.label("RoleId"),
+    Role.role_name.label("RoleName"),
+    Role.arn.label("Arn"),
+    Role.create_date.label("CreateDate"),
+    Role.assume_role_policy_document.label("AssumeRolePolicyDocument"),
+    Role.attached_managed_policies.label("AttachedManagedPolicies"),
+    Role.role_policy_list.label("RolePolicyList"),
+    Role.tags.label("Tags"),
+)
+
+_POLICY_COLUMNS = (
+    Policy.policy_id.label("PolicyId"),
+    Policy.policy_name.label("PolicyName"),
+    Policy.arn.label("Arn"),
+    Policy.create_date.label("CreateDate"),
+    Policy.default_version_id.label("DefaultVersionId"),
+    Policy.policy_version_list.label("PolicyVersionList"),
+    Policy.attachment_count.label("AttachmentCount"),
+    Policy.is_attachable.label("IsAttachable"),
+    Policy.description.label("Description"),
+)
+
+_GROUP_COLUMNS = (
+    Group.group_id.label("GroupId"),
+    Group.group_name.label("GroupName"),
+    Group.arn.label("Arn"),
+    Group.create_date.label("CreateDate"),
+    Group.attached_managed_policies.label("AttachedManagedPolicies"),
+    Group.group_policy_list.label("GroupPolicyList"),
+)
+
+async def _get_one(db: AsyncSession, model, columns: tuple, id_column, entity_id: str) -> RowMapping | None:
+    # upload_id rides along so callers can tell which upload the row came from
+    result = await db.execute(
+        select(model.upload_id, *columns).where(
+            id_column == entity_id,
+            model.upload_id == _current_upload_subq
+        )
+    )
+    return result.mappings().first()
+
+async def get_user_by_id(db: AsyncSession, user_id: str) -> RowMapping | None:
     """Get a user by ID from the current upload"""
-    current_upload_id = get_current_upload_id(db)
-    if not current_upload_id:
-        return None
-    return db.query(User).filter(
-        User.user_id == user_id,
-        User.upload_id == current_upload_id
-    ).first()
-
-def get_role_by_id(db: Session, role_id: str) -> Role | None:
+    return await _get_one(db, User, _USER_COLUMNS, User.user_id, user_id)
+
+async def get_role_by_id(db: AsyncSession, role_id: str) -> RowMapping | None:
     """Get a role by ID from the current upload"""
-    current_upload_id = get_current_upload_id(db)
-    if not current_upload_id:
-        return None
-    return db.query(Role).filter(
-        Role.role_id == role_id,
-        Role.upload_id == current_upload_id
-    ).first()
-
-def get_policy_by_id(db: Session, policy_id: str) -> Policy | None:
+    return await _get_one(db, Role, _ROLE_COLUMNS, Role.role_id, role_id)
+
+async def get_policy_by_id(db: AsyncSession, policy_id: str) -> RowMapping | None:
     """Get a policy by ID from the current upload"""
-    current_upload_id = get_current_upload_id(db)
-    if not current_upload_id:
-        return None
-    return db.query(Policy).filter(
-        Policy.policy_id == policy_id,
-        Policy.upload_id == current_upload_id
-    ).first()
-
-def get_group_by_id(db: Session, group_id: str) -> Group | None:
+    return await _get_one(db, Policy, _POLICY_COLUMNS, Policy.policy_id, policy_id)
+
+async def get_group_by_id(db: AsyncSession, group_id: str) -> RowMapping | None:
     """Get a group by ID from the current upload"""
-    current_upload_id = get_current_upload_id(db)
-    if not current_upload_id:
-        return None
-    return db.query(Group).filter(
-        Group.group_id == group_id,
-        Group.upload_id == current_upload_id
-    ).first()
+    return await _get_one(db, Group, _GROUP_COLUMNS, Group.group_id, group_id)
+
+# Batch variants resolve a list of IDs with one IN query instead of one
+# query per ID
+async def _get_many(db: AsyncSession, model, columns: tuple, id_column, entity_ids: list[str]) -> list[RowMapping]:
+    if not entity_ids:
+        return []
+    result = await db.execute(
+        select(*columns).where(
+            id_column.in_(entity_ids),
+            model.upload_id == _current_upload_subq
+        )
+    )
+    return list(result.mappings().all())
+
+async def get_users_by_ids(db: AsyncSession, user_ids: list[str]) -> list[RowMapping]:
+    """Get several users by ID from the current upload in one query"""
+    return await _get_many(db, User, _USER_COLUMNS, User.user_id, user_ids)
+
+async def get_roles_by_ids(db: AsyncSession, role_ids: list[str]) -> list[RowMapping]:
+    """Get several roles by ID from the current upload in one query"""
+    return await _get_many(db, Role, _ROLE_COLUMNS, Role.role_id, role_ids)
+
+async def get_policies_by_ids(db: AsyncSession, policy_ids: list[str]) -> list[RowMapping]:
+    """Get several policies by ID from the current upload in one query"""
+    return await _get_many(db, Policy, _POLICY_COLUMNS, Policy.policy_id, policy_ids)
+
+async def get_groups_by_ids(db: AsyncSession, group_ids: list[str]) -> list[RowMapping]:
+    """Get several groups by ID from the current upload in one query"""
+    return await _get_many(db, Group, _GROUP_COLUMNS, Group.group_id, group_ids)
+
+
+# Per-policy LLM results are keyed by (upload_id, policy_id); upserts go through
+# a single INSERT ... ON CONFLICT DO UPDATE instead of SELECT then INSERT/UPDATE
+async def _upsert_many_by_policy(db: AsyncSession, model, rows: list[dict], commit: bool = True) -> list:
+    # ON CONFLICT can't touch the same row twice in one statement, so the last
+    # entry per key wins
+    rows = list({(row["upload_id"], row["policy_id"]): row for row in rows}.values())
+    if not rows:
+        return []
+    stmt = pg_insert(model).values(rows)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[model.upload_id, model.policy_id],
+        set_={
+            **{key: stmt.excluded[key] for key in rows[0] if key not in ("upload_id", "policy_id")},
+            "updated_at": func.now(),
+        },
+    ).returning(model)
+    recs = (await db.scalars(stmt, execution_options={"populate_existing": True})).all()
+    if commit:
+        await db.commit()
+    return list(recs)
+
+
+async def _upsert_by_policy(db: AsyncSession, model, values: dict):
+    return (await _upsert_many_by_policy(db, model, [values]))[0]
+
+
+# Batch lookups resolve many policies of one upload with a single
+# WHERE upload_id = :u AND policy_id IN (...) query; the single-policy
+# getters delegate to them
+async def _get_by_policies(db: AsyncSession, model, upload_id: UUID, policy_ids: list[str]) -> dict:
+    if not policy_ids:
+        return {}
+    rows = await db.scalars(
+        select(model).where(model.upload_id == upload_id, model.policy_id.in_(policy_ids))
+    )
+    return {row.policy_id: row for row in rows}
 
 
 # LLM Recommendation CRUD
-def upsert_llm_recommendation(
-    db: Session,
-    upload_id: str,
+async def upsert_llm_recommendation(
+    db: AsyncSession,
+    upload_id: UUID,
     policy_id: str,
     policy_name: str,
     recommendations: list[str],
     rationale: str | None,
 ) -> LLMRecommendation:
-    existing = (
-        db.query(LLMRecommendation)
-        .filter(LLMRecommendation.upload_id == upload_id, LLMRecommendation.policy_id == policy_id)
-        .first()
-    )
-    if existing:
-        existing.policy_name = policy_name
-        existing.recommendations = recommendations
-        existing.rationale = rationale
-        db.commit()
-        db.refresh(existing)
-        return existing
-
-    rec = LLMRecommendation(
-        upload_id=upload_id,
-        policy_id=policy_id,
-        policy_name=policy_name,
-        recommendations=recommendations,
-        rationale=rationale,
+    return await _upsert_by_policy(
+        db,
+        LLMRecommendation,
+        dict(
+            upload_id=upload_id,
+            policy_id=policy_id,
+            policy_name=policy_name,
+            recommendations=recommendations,
+            rationale=rationale,
+        ),
     )
-    db.add(rec)
-    db.commit()
-    db.refresh(rec)
-    return rec
 
 
-def get_llm_recommendation(db: Session, upload_id: str, policy_id: str) -> LLMRecommendation | None:
-    return (
-        db.query(LLMRecommendation)
-        .filter(LLMRecommendation.upload_id == upload_id, LLMRecommendation.policy_id == policy_id)
-        .first()
-    )
+async def upsert_llm_recommendations(db: AsyncSession, rows: list[dict]) -> list[LLMRecommendation]:
+    return await _upsert_many_by_policy(db, LLMRecommendation, rows)
+
+
+async def get_llm_recommendations_for_policies(db: AsyncSession, upload_id: UUID, policy_ids: list[str]) -> dict[str, LLMRecommendation]:
+    return await _get_by_policies(db, LLMRecommendation, upload_id, policy_ids)
+
+
+async def get_llm_recommendation(db: AsyncSession, upload_id: UUID, policy_id: str) -> LLMRecommendation | None:
+    return (await get_llm_recommendations_for_policies(db, upload_id, [policy_id])).get(policy_id)
 
 
 # Recommended Policy CRUD
-def upsert_recommended_policy(
-    db: Session,
-    upload_id: str,
+async def upsert_recommended_policy(
+    db: AsyncSession,
+    upload_id: UUID,
     policy_id: str,
     policy_name: str,
     policy_document: dict,
     explanation: str | None,
 ) -> RecommendedPolicy:
-    existing = (
-        db.query(RecommendedPolicy)
-        .filter(RecommendedPolicy.upload_id == upload_id, RecommendedPolicy.policy_id == policy_id)
-        .first()
-    )
-    if existing:
-        existing.policy_name = policy_name
-        existing.policy_document = policy_document
-        existing.explanation = explanation
-        db.commit()
-        db.refresh(existing)
-        return existing
-
-    rec = RecommendedPolicy(
-        upload_id=upload_id,
-        policy_id=policy_id,
-        policy_name=policy_name,
-        policy_document=policy_document,
-        explanation=explanation,
+    return await _upsert_by_policy(
+        db,
+        RecommendedPolicy,
+        dict(
+            upload_id=upload_id,
+            policy_id=policy_id,
+            policy_name=policy_name,
+            policy_document=policy_document,
+            explanation=explanation,
+        ),
     )
-    db.add(rec)
-    db.commit()
-    db.refresh(rec)
-    return rec
 
 
-def get_recommended_policy(db: Session, upload_id: str, policy_id: str) -> RecommendedPolicy | None:
-    return (
-        db.query(RecommendedPolicy)
-        .filter(RecommendedPolicy.upload_id == upload_id, RecommendedPolicy.policy_id == policy_id)
-        .first()
-    )
+async def get_recommended_policies_for_policies(db: AsyncSession, upload_id: UUID, policy_ids: list[str]) -> dict[str, RecommendedPolicy]:
+    return await _get_by_policies(db, RecommendedPolicy, upload_id, policy_ids)
+
+
+async def get_recommended_policy(db: AsyncSession, upload_id: UUID, policy_id: str) -> RecommendedPolicy | None:
+    return (await get_recommended_policies_for_policies(db, upload_id, [policy_id])).get(policy_id)
 
 
 # Attack Path CRUD
-def upsert_attack_path(
-    db: Session,
-    upload_id: str,
+async def upsert_attack_path(
+    db: AsyncSession,
+    upload_id: UUID,
     policy_id: str,
     policy_name: str,
     attack_scenarios: list,
     impact_assessment: str | None,
 ) -> AttackPath:
-    existing = (
-        db.query(AttackPath)
-        .filter(AttackPath.upload_id == upload_id, AttackPath.policy_id == policy_id)
-        .first()
-    )
-    if existing:
-        existing.policy_name = policy_name
-        existing.attack_scenarios = attack_scenarios
-        existing.impact_assessment = impact_assessment
-        db.commit()
-        db.refresh(existing)
-        return existing
-
-    rec = AttackPath(
-        upload_id=upload_id,
-        policy_id=policy_id,
-        policy_name=policy_name,
-        attack_scenarios=attack_scenarios,
-        impact_assessment=impact_assessment,
+    return await _upsert_by_policy(
+        db,
+        AttackPath,
+        dict(
+            upload_id=upload_id,
+            policy_id=policy_id,
+            policy_name=policy_name,
+            attack_scenarios=attack_scenarios,
+            impact_assessment=impact_assessment,
+        ),
     )
-    db.add(rec)
-    db.commit()
-    db.refresh(rec)
-    return rec
 
 
-def get_attack_path(db: Session, upload_id: str, policy_id: str) -> AttackPath | None:
-    return (
-        db.query(AttackPath)
-        .filter(AttackPath.upload_id == upload_id, AttackPath.policy_id == policy_id)
-        .first()
-    )
+async def get_attack_paths_for_policies(db: AsyncSession, upload_id: UUID, policy_ids: list[str]) -> dict[str, AttackPath]:
+    return await _get_by_policies(db, AttackPath, upload_id, policy_ids)
+
+
+async def get_attack_path(db: AsyncSession, upload_id: UUID, policy_id: str) -> AttackPath | None:
+    return (await get_attack_paths_for_policies(db, upload_id, [policy_id])).get(policy_id)
+
+
+async def upsert_policy_analysis(
+    db: AsyncSession,
+    recommendation: dict,
+    recommended_policy: dict,
+    attack_path: dict,
+) -> tuple[LLMRecommendation, RecommendedPolicy, AttackPath]:
+    """Upsert all three LLM results for a policy and commit them together"""
+    rec = (await _upsert_many_by_policy(db, LLMRecommendation, [recommendation], commit=False))[0]
+    policy = (await _upsert_many_by_policy(db, RecommendedPolicy, [recommended_policy], commit=False))[0]
+    attack = (await _upsert_many_by_policy(db, AttackPath, [attack_path], commit=False))[0]
+    await db.commit()
+    return rec, policy, attack
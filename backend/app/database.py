@@ -1,21 +1,36 @@
-from sqlalchemy import create_engine
+import orjson
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
 from app.config import settings
 
 # Create database engine
-engine = create_engine(settings.database_url)
+# Requests await database I/O through asyncpg, whatever driver DATABASE_URL
+# names, so slow queries don't block the event loop.
+# Pooled connections are reused across requests; stale ones are detected
+# with a pre-ping and recycled after db_pool_recycle seconds. A request that
+# can't get a connection within db_pool_timeout fails instead of queueing.
+engine = create_async_engine(
+    make_url(settings.database_url).set(drivername="postgresql+asyncpg"),
+    pool_size=settings.db_pool_size,
+    max_overflow=settings.db_max_overflow,
+    pool_timeout=settings.db_pool_timeout,
+    pool_pre_ping=True,
+    pool_recycle=settings.db_pool_recycle,
+    # JSON(B) columns are (de)serialized with orjson instead of stdlib json
+    json_serializer=lambda value: orjson.dumps(value).decode(),
+    json_deserializer=orjson.loads,
+)
 
 # Create SessionLocal class
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Objects stay loaded after commit; with AsyncSession an expired attribute
+# can't be refreshed implicitly on access
+SessionLocal = async_sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)
 
 # Create Base class
 Base = declarative_base()
 
 # Dependency to get DB session
-def get_db():
-    db = SessionLocal()
-    try:
+async def get_db():
+    async with SessionLocal() as db:
         yield db
-    finally:
-        db.close()
@@ -1,3 +1,6 @@
+from contextlib import asynccontextmanager
+
+import anyio.to_thread
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.config import settings
@@ -6,13 +9,22 @@ from app.routers.uploads import router as uploads_router
 from app.routers.iam_data import router as iam_data_router
 from app.routers.llm import router as llm_router
 
-# Create database tables
-Base.metadata.create_all(bind=engine)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Size the shared threadpool explicitly instead of relying on anyio's default of 40
+    anyio.to_thread.current_default_thread_limiter().total_tokens = settings.threadpool_size
+
+    # Create database tables
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    yield
+    await engine.dispose()
 
 app = FastAPI(
     title="AWS IAM Viewer API",
     description="Backend API for Permeo",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Configure CORS
@@ -1,4 +1,7 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, JSON
+import uuid
+
+from sqlalchemy import Boolean, Column, Integer, String, Text, DateTime, ForeignKey, Index, UniqueConstraint
+from sqlalchemy.dialects.postgresql import JSONB, UUID
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.database import Base
@@ -6,94 +9,107 @@ from app.database import Base
 class Upload(Base):
     __tablename__ = "uploads"
 
-    id = Column(String, primary_key=True, index=True)
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     name = Column(String, nullable=False)
     original_filename = Column(String, nullable=False)
     uploaded_at = Column(DateTime(timezone=True), server_default=func.now())
     size = Column(Integer, nullable=False)
 
-    # Relationships
-    users = relationship("User", back_populates="upload", cascade="all, delete-orphan")
-    roles = relationship("Role", back_populates="upload", cascade="all, delete-orphan")
-    policies = relationship("Policy", back_populates="upload", cascade="all, delete-orphan")
-    groups = relationship("Group", back_populates="upload", cascade="all, delete-orphan")
+    # Relationships (child rows are removed by ON DELETE CASCADE in the database)
+    users = relationship("User", back_populates="upload", cascade="all, delete-orphan", passive_deletes=True)
+    roles = relationship("Role", back_populates="upload", cascade="all, delete-orphan", passive_deletes=True)
+    policies = relationship("Policy", back_populates="upload", cascade="all, delete-orphan", passive_deletes=True)
+    groups = relationship("Group", back_populates="upload", cascade="all, delete-orphan", passive_deletes=True)
+
+    # Fetch uploaded_at via INSERT ... RETURNING instead of a refresh SELECT
+    __mapper_args__ = {"eager_defaults": True}
 
 class User(Base):
     __tablename__ = "users"
+    # Lookups always filter by (upload_id, user_id) together
+    __table_args__ = (Index("ix_users_upload_user", "upload_id", "user_id"),)
 
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(String, nullable=False, index=True)
+    user_id = Column(String, nullable=False)
     user_name = Column(String, nullable=False)
     arn = Column(String, nullable=False)
     create_date = Column(String, nullable=False)
-    attached_managed_policies = Column(JSON, nullable=False)
-    group_list = Column(JSON, nullable=False)
-    user_policy_list = Column(JSON, nullable=False)
-    tags = Column(JSON, nullable=False)
+    attached_managed_policies = Column(JSONB, nullable=False)
+    group_list = Column(JSONB, nullable=False)
+    user_policy_list = Column(JSONB, nullable=False)
+    tags = Column(JSONB, nullable=False)
 
     # Foreign key
-    upload_id = Column(String, ForeignKey("uploads.id"), nullable=False)
+    upload_id = Column(UUID(as_uuid=True), ForeignKey("uploads.id", ondelete="CASCADE"), nullable=False)
     upload = relationship("Upload", back_populates="users")
 
 class Role(Base):
     __tablename__ = "roles"
+    __table_args__ = (Index("ix_roles_upload_role", "upload_id", "role_id"),)
 
     id = Column(Integer, primary_key=True, index=True)
-    role_id = Column(String, nullable=False, index=True)
+    role_id = Column(String, nullable=False)
     role_name = Column(String, nullable=False)
     arn = Column(String, nullable=False)
     create_date = Column(String, nullable=False)
-    assume_role_policy_document = Column(JSON, nullable=False)
-    attached_managed_policies = Column(JSON, nullable=False)
-    role_policy_list = Column(JSON, nullable=False)
-    tags = Column(JSON, nullable=False)
+    assume_role_policy_document = Column(JSONB, nullable=False)
+    attached_managed_policies = Column(JSONB, nullable=False)
+    role_policy_list = Column(JSONB, nullable=False)
+    tags = Column(JSONB, nullable=False)
 
     # Foreign key
-    upload_id = Column(String, ForeignKey("uploads.id"), nullable=False)
+    upload_id = Column(UUID(as_uuid=True), ForeignKey("uploads.id", ondelete="CASCADE"), nullable=False)
     upload = relationship("Upload", back_populates="roles")
 
 class Policy(Base):
     __tablename__ = "policies"
+    __table_args__ = (Index("ix_policies_upload_policy", "upload_id", "policy_id"),)
 
     id = Column(Integer, primary_key=True, index=True)
-    policy_id = Column(String, nullable=False, index=True)
+    policy_id = Column(String, nullable=False)
     policy_name = Column(String, nullable=False)
     arn = Column(String, nullable=False)
     create_date = Column(String, nullable=False)
     default_version_id = Column(String, nullable=False)
-    policy_version_list = Column(JSON, nullable=False)
+    policy_version_list = Column(JSONB, nullable=False)
     attachment_count = Column(Integer, nullable=False)
-    is_attachable = Column(String, nullable=False)  # boolean as string
+    is_attachable = Column(Boolean, nullable=False)
     description = Column(String, nullable=True)
 
     # Foreign key
-    upload_id = Column(String, ForeignKey("uploads.id"), nullable=False)
+    upload_id = Column(UUID(as_uuid=True), ForeignKey("uploads.id", ondelete="CASCADE"), nullable=False)
     upload = relationship("Upload", back_populates="policies")
 
 class Group(Base):
     __tablename__ = "groups"
+    __table_args__ = (Index("ix_groups_upload_group", "upload_id", "group_id"),)
 
     id = Column(Integer, primary_key=True, index=True)
-    group_id = Column(String, nullable=False, index=True)
+    group_id = Column(String, nullable=False)
     group_name = Column(String, nullable=False)
     arn = Column(String, nullable=False)
     create_date = Column(String, nullable=False)
-    attached_managed_policies = Column(JSON, nullable=False)
-    group_policy_list = Column(JSON, nullable=False)
+    attached_managed_policies = Column(JSONB, nullable=False)
+    group_policy_list = Column(JSONB, nullable=False)
 
     # Foreign key
-    upload_id = Column(String, ForeignKey("uploads.id"), nullable=False)
+    upload_id = Column(UUID(as_uuid=True), ForeignKey("uploads.id", ondelete="CASCADE"), nullable=False)
     upload = relationship("Upload", back_populates="groups")
 
 
 class LLMRecommendation(Base):
     __tablename__ = "llm_recommendations"
+    # Every lookup filters on (upload_id, policy_id); the composite unique
+    # index serves those point queries and is the upsert conflict target
+    __table_args__ = (
+        UniqueConstraint("upload_id", "policy_id", name="uq_llm_recommendations_upload_policy"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
-    upload_id = Column(String, ForeignKey("uploads.id"), nullable=False, index=True)
-    policy_id = Column(String, nullable=False, index=True)
+    upload_id = Column(UUID(as_uuid=True), ForeignKey("uploads.id", ondelete="CASCADE"), nullable=False)
+    policy_id = Column(String, nullable=False)
     policy_name = Column(String, nullable=False)
-    recommendations = Column(JSON, nullable=False)
+    recommendations = Column(JSONB, nullable=False)
     rationale = Column(Text, nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
@@ -103,12 +119,15 @@ class LLMRecommendation(Base):
 
 class RecommendedPolicy(Base):
     __tablename__ = "recommended_policies"
+    __table_args__ = (
+        UniqueConstraint("upload_id", "policy_id", name="uq_recommended_policies_upload_policy"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
-    upload_id = Column(String, ForeignKey("uploads.id"), nullable=False, index=True)
-    policy_id = Column(String, nullable=False, index=True)
+    upload_id = Column(UUID(as_uuid=True), ForeignKey("uploads.id", ondelete="CASCADE"), nullable=False)
+    policy_id = Column(String, nullable=False)
     policy_name = Column(String, nullable=False)
-    policy_document = Column(JSON, nullable=False)
+    policy_document = Column(JSONB, nullable=False)
     explanation = Column(Text, nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
@@ -118,12 +137,15 @@ class RecommendedPolicy(Base):
 
 class AttackPath(Base):
     __tablename__ = "attack_paths"
+    __table_args__ = (
+        UniqueConstraint("upload_id", "policy_id", name="uq_attack_paths_upload_policy"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
-    upload_id = Column(String, ForeignKey("uploads.id"), nullable=False, index=True)
-    policy_id = Column(String, nullable=False, index=True)
+    upload_id = Column(UUID(as_uuid=True), ForeignKey("uploads.id", ondelete="CASCADE"), nullable=False)
+    policy_id = Column(String, nullable=False)
     policy_name = Column(String, nullable=False)
-    attack_scenarios = Column(JSON, nullable=False)
+    attack_scenarios = Column(JSONB, nullable=False)
     impact_assessment = Column(Text, nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
@@ -6,68 +6,102 @@ attack path processing, and database operations for attack paths.
 """
 
 from typing import Any, Dict, List, Optional
-from sqlalchemy.orm import Session
+from uuid import UUID
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.crud import (
     upsert_attack_path, 
     get_attack_path, 
+    get_attack_paths_for_policies,
     get_current_upload_id
 )
 from app.schemas import AttackPathResponse
 from app.modules.llm_service import llm_service
+from app.modules.llm_types import LLMContext
 
 
 class AttackService:
     """Service class for handling attack path analysis operations."""
     
+    __slots__ = ("llm_service",)
+    
     def __init__(self):
         self.llm_service = llm_service
     
-    def generate_attack_path(self, policy_context: Dict[str, Any], db: Session) -> AttackPathResponse:
+    @staticmethod
+    def _to_response(attack_path) -> AttackPathResponse:
+        return AttackPathResponse(
+            upload_id=attack_path.upload_id,
+            policy_id=attack_path.policy_id,
+            policy_name=attack_path.policy_name,
+            attack_scenarios=attack_path.attack_scenarios,
+            impact_assessment=attack_path.impact_assessment,
+            created_at=attack_path.created_at,
+            updated_at=attack_path.updated_at,
+        )
+    
+    @staticmethod
+    def generated_response(policy_context: LLMContext, generated: Dict[str, Any],
+                           upload_id: Optional[UUID]) -> AttackPathResponse:
         """
-        Generate attack path scenarios and store them in the database.
+        Build a response for a generated attack path that has not been stored (yet).
         
         Args:
-            policy_context: Dictionary containing policy context and security issues
-            db: Database session
+            policy_context: Policy the scenarios were generated for
+            generated: Dictionary with attack_scenarios and impact_assessment
+            upload_id: Upload the result belongs to, or None if there is no current upload
             
         Returns:
-            AttackPathResponse
+            AttackPathResponse without timestamps
         """
-        # Generate attack scenarios using LLM service
-        result = self.llm_service.generate_attack_path(policy_context)
+        return AttackPathResponse(
+            upload_id=upload_id,
+            policy_id=policy_context.policy_id,
+            policy_name=policy_context.policy_name,
+            attack_scenarios=generated["attack_scenarios"],
+            impact_assessment=generated["impact_assessment"],
+            created_at=None,
+            updated_at=None,
+        )
+    
+    async def generate_attack_path(self, policy_context: LLMContext, refresh: bool = False) -> Dict[str, Any]:
+        """
+        Generate attack path scenarios without storing them.
         
-        # Store the attack path in the database
-        current_upload_id = get_current_upload_id(db)
-        if current_upload_id:
-            stored_attack_path = upsert_attack_path(
-                db=db,
-                upload_id=current_upload_id,
-                policy_id=policy_context["policy_context"]["policy_id"],
-                policy_name=policy_context["policy_context"]["policy_name"],
-                attack_scenarios=result["attack_scenarios"],
-                impact_assessment=result["impact_assessment"],
-            )
-            return AttackPathResponse(
-                upload_id=stored_attack_path.upload_id,
-                policy_id=stored_attack_path.policy_id,
-                policy_name=stored_attack_path.policy_name,
-                attack_scenarios=stored_attack_path.attack_scenarios,
-                impact_assessment=stored_attack_path.impact_assessment,
-                created_at=stored_attack_path.created_at.isoformat() if stored_attack_path.created_at else None,
-                updated_at=stored_attack_path.updated_at.isoformat() if stored_attack_path.updated_at else None,
-            )
-        else:
-            # Fallback if no current upload
-            return AttackPathResponse(
-                upload_id="",
-                policy_id=policy_context["policy_context"]["policy_id"],
-                policy_name=policy_context["policy_context"]["policy_name"],
-                attack_scenarios=result["attack_scenarios"],
-                impact_assessment=result["impact_assessment"]
-            )
+        Args:
+            policy_context: Policy and detected flags to analyze
+            refresh: Bypass the LLM result cache
+            
+        Returns:
+            Dictionary with attack_scenarios and impact_assessment
+        """
+        return await self.llm_service.generate_attack_path(policy_context.attack_path_context(), refresh)
     
-    def get_stored_attack_path(self, upload_id: str, policy_id: str, db: Session) -> Optional[AttackPathResponse]:
+    async def store_attack_path(self, upload_id: UUID, policy_context: LLMContext,
+                                generated: Dict[str, Any], db: AsyncSession) -> AttackPathResponse:
+        """
+        Store generated attack path scenarios for an upload.
+        
+        Args:
+            upload_id: Upload ID
+            policy_context: Policy the scenarios were generated for
+            generated: Dictionary with attack_scenarios and impact_assessment
+            db: Database session
+            
+        Returns:
+            AttackPathResponse of the stored row
+        """
+        stored_attack_path = await upsert_attack_path(
+            db=db,
+            upload_id=upload_id,
+            policy_id=policy_context.policy_id,
+            policy_name=policy_context.policy_name,
+            attack_scenarios=generated["attack_scenarios"],
+            impact_assessment=generated["impact_assessment"],
+        )
+        return self._to_response(stored_attack_path)
+    
+    async def get_stored_attack_path(self, upload_id: UUID, policy_id: str, db: AsyncSession) -> Optional[AttackPathResponse]:
         """
         Get a stored attack path analysis from the database.
         
@@ -79,23 +113,31 @@ class AttackService:
         Returns:
             AttackPathResponse or None if not found
         """
-        attack_path = get_attack_path(db, upload_id, policy_id)
+        attack_path = await get_attack_path(db, upload_id, policy_id)
         if not attack_path:
             return None
         
-        return AttackPathResponse(
-            upload_id=attack_path.upload_id,
-            policy_id=attack_path.policy_id,
-            policy_name=attack_path.policy_name,
-            attack_scenarios=attack_path.attack_scenarios,
-            impact_assessment=attack_path.impact_assessment,
-            created_at=attack_path.created_at.isoformat() if attack_path.created_at else None,
-            updated_at=attack_path.updated_at.isoformat() if attack_path.updated_at else None,
-        )
+        return self._to_response(attack_path)
+    
+    async def get_stored_attack_paths(self, upload_id: UUID, policy_ids: List[str], db: AsyncSession) -> Dict[str, AttackPathResponse]:
+        """
+        Get stored attack path analyses for several policies in one query.
+        
+        Args:
+            upload_id: Upload ID
+            policy_ids: Policy IDs to look up
+            db: Database session
+            
+        Returns:
+            Dictionary of AttackPathResponse keyed by policy ID; policies
+            without a stored analysis are omitted
+        """
+        attack_paths = await get_attack_paths_for_policies(db, upload_id, policy_ids)
+        return {policy_id: self._to_response(attack_path) for policy_id, attack_path in attack_paths.items()}
     
-    def persist_attack_path(self, upload_id: str, policy_id: str, policy_name: str, 
-                          attack_scenarios: List[Dict[str, Any]], impact_assessment: Optional[str], 
-                          db: Session) -> AttackPathResponse:
+    async def persist_attack_path(self, upload_id: UUID, policy_id: str, policy_name: str, 
+                                attack_scenarios: List[Dict[str, Any]], impact_assessment: Optional[str], 
+                                db: AsyncSession) -> AttackPathResponse:
         """
         Persist an attack path analysis to the database.
         
@@ -110,7 +152,7 @@ class AttackService:
         Returns:
             AttackPathResponse
         """
-        attack_path = upsert_attack_path(
+        attack_path = await upsert_attack_path(
             db=db,
             upload_id=upload_id,
             policy_id=policy_id,
@@ -119,32 +161,26 @@ class AttackService:
             impact_assessment=impact_assessment,
         )
         
-        return AttackPathResponse(
-            upload_id=attack_path.upload_id,
-            policy_id=attack_path.policy_id,
-            policy_name=attack_path.policy_name,
-            attack_scenarios=attack_path.attack_scenarios,
-            impact_assessment=attack_path.impact_assessment,
-            created_at=attack_path.created_at.isoformat() if attack_path.created_at else None,
-            updated_at=attack_path.updated_at.isoformat() if attack_path.updated_at else None,
-        )
+        return self._to_response(attack_path)
     
-    def regenerate_attack_path(self, policy_context: Dict[str, Any], db: Session) -> AttackPathResponse:
+    async def regenerate_attack_path(self, policy_context: LLMContext, db: AsyncSession) -> AttackPathResponse:
         """
         Regenerate and store an attack path analysis.
         
         Args:
-            policy_context: Dictionary containing policy context
+            policy_context: Policy and detected flags to analyze
             db: Database session
             
         Returns:
             AttackPathResponse
         """
-        # Generate the attack path (which will automatically store it)
-        generated = self.generate_attack_path(policy_context, db)
+        generated = await self.generate_attack_path(policy_context, refresh=True)
         
         # Return the stored result with timestamps
-        return generated
+        current_upload_id = await get_current_upload_id(db)
+        if current_upload_id:
+            return await self.store_attack_path(current_upload_id, policy_context, generated, db)
+        return self.generated_response(policy_context, generated, None)
 
 
 # Create a singleton instance
@@ -0,0 +1,192 @@
+"""
+LLM Cache Module
+
+Caches Gemini results keyed by a hash of the request, so repeated analyses of
+the same policy context skip the model round trip entirely.
+"""
+
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Protocol, Sequence, Tuple
+import hashlib
+import time
+
+import orjson
+
+from app.cache import redis_client
+from app.config import settings
+
+# Detector findings arrive in whatever order the frontend produced them; the
+# order carries no meaning, so it is normalized before hashing. Statements keep
+# their order because flags refer to them by index.
+_UNORDERED_KEYS = ("detected_flags", "detected_security_issues")
+
+
+def _canonical_context(policy_context: Dict[str, Any]) -> Dict[str, Any]:
+    canonical = dict(policy_context)
+    for key in _UNORDERED_KEYS:
+        flags = canonical.get(key)
+        if isinstance(flags, list):
+            canonical[key] = sorted(flags, key=lambda flag: orjson.dumps(flag, option=orjson.OPT_SORT_KEYS))
+    organization_context = canonical.get("organization_context")
+    if isinstance(organization_context, str):
+        canonical["organization_context"] = " ".join(organization_context.split())
+    return canonical
+
+
+class CacheBackend(Protocol):
+    """Storage for serialized cache entries."""
+
+    async def get(self, key: str) -> Optional[bytes]:
+        ...
+
+    async def set(self, key: str, value: bytes, ttl_seconds: int) -> None:
+        ...
+
+
+class MemoryBackend:
+    """In-process LRU, capped at max_entries."""
+
+    __slots__ = ("max_entries", "_entries")
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, bytes]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    async def get(self, key: str) -> Optional[bytes]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value: bytes, ttl_seconds: int) -> None:
+        self._entries[key] = (time.monotonic() + ttl_seconds, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+
+class RedisBackend:
+    """Shared cache on a redis.asyncio client."""
+
+    __slots__ = ("_client",)
+
+    def __init__(self, client: Any):
+        self._client = client
+
+    async def get(self, key: str) -> Optional[bytes]:
+        try:
+            return await self._client.get(key)
+        except Exception:
+            # Redis is an optimization; an outage degrades to a miss
+            return None
+
+    async def set(self, key: str, value: bytes, ttl_seconds: int) -> None:
+        try:
+            await self._client.set(key, value, ex=ttl_seconds)
+        except Exception:
+            pass
+
+
+class LLMCache:
+    """LLM result cache over one or more backends, fastest first."""
+
+    __slots__ = ("ttl_seconds", "max_org_context_chars", "_backends", "hits", "misses")
+
+    def __init__(self, backends: Sequence[CacheBackend], ttl_seconds: int, max_org_context_chars: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_org_context_chars = max_org_context_chars
+        self._backends = list(backends)
+        self.hits = 0
+        self.misses = 0
+
+    def make_key(self, method: str, model_name: str, policy_context: Dict[str, Any]) -> Optional[str]:
+        """
+        Build the cache key for an LLM call.
+
+        Contexts that differ only in flag order, key order or whitespace in
+        organization_context share a key.
+
+        Args:
+            method: Name of the LLMService method
+            model_name: Gemini model name
+            policy_context: Context passed to the model
+
+        Returns:
+            Cache key string, or None when the context is not cached because
+            its free-form organization_context is too large to be worth keeping
+        """
+        if len(policy_context.get("organization_context") or "") > self.max_org_context_chars:
+            return None
+        payload = orjson.dumps(_canonical_context(policy_context), option=orjson.OPT_SORT_KEYS)
+        digest = hashlib.sha256(b"\0".join((method.encode(), model_name.encode(), payload))).hexdigest()
+        return f"llm:{method}:{digest}"
+
+    async def get(self, key: Optional[str]) -> Optional[Dict[str, Any]]:
+        """
+        Look up a cached result.
+
+        Args:
+            key: Cache key from make_key
+
+        Returns:
+            The cached result, or None on a miss
+        """
+        if key is None:
+            return None
+        for index, backend in enumerate(self._backends):
+            value = await backend.get(key)
+            if value is not None:
+                # Backfill the faster backends in front of the one that hit
+                for front in self._backends[:index]:
+                    await front.set(key, value, self.ttl_seconds)
+                self.hits += 1
+                return orjson.loads(value)
+
+        self.misses += 1
+        return None
+
+    async def set(self, key: Optional[str], result: Dict[str, Any]) -> None:
+        """
+        Store a result.
+
+        Args:
+            key: Cache key from make_key
+            result: JSON-serializable result to cache
+        """
+        if key is None:
+            return
+        value = orjson.dumps(result)
+        for backend in self._backends:
+            await backend.set(key, value, self.ttl_seconds)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters and the local cache size."""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "local_entries": sum(len(backend) for backend in self._backends if isinstance(backend, MemoryBackend)),
+            "redis_enabled": any(isinstance(backend, RedisBackend) for backend in self._backends),
+        }
+
+
+def _default_backends() -> List[CacheBackend]:
+    backends: List[CacheBackend] = [MemoryBackend(settings.llm_cache_max_entries)]
+    if redis_client is not None:
+        backends.append(RedisBackend(redis_client))
+    return backends
+
+
+# Create a singleton instance
+llm_cache = LLMCache(
+    _default_backends(),
+    ttl_seconds=settings.llm_cache_ttl_seconds,
+    max_org_context_chars=settings.llm_cache_max_org_context_chars,
+)
@@ -5,23 +5,183 @@ Handles all interactions with the Gemini LLM API for generating recommendations,
 policy improvements, and attack path analysis.
 """
 
-from typing import Any, Dict, List, Optional
-import json
-import re
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Final, Iterator, List, Optional, Tuple, Union
+import asyncio
+
+import orjson
 
 from app.config import settings
+from app.modules.llm_cache import llm_cache
 
 try:
     import google.generativeai as genai
 except Exception:  # pragma: no cover
     genai = None  # type: ignore
 
+# Static instructions are sent as the model's system instruction rather than
+# being rebuilt into every prompt
+RECOMMENDATIONS_SYSTEM_PROMPT = (
+    "You are a senior cloud security engineer. Given AWS IAM policy statements "
+    "and detected risky flags, produce specific remediation recommendations. "
+    "Favor least-privilege, resource scoping, and conditional constraints. "
+    "Return clear, concise bullet recommendations. Include a short rationale paragraph."
+    "The recommendations should be formatted in markdown format for easy readability."
+)
+
+RECOMMENDED_POLICY_SYSTEM_PROMPT = (
+    "You are a senior cloud security engineer. Given an AWS IAM policy with detected "
+    "security issues, generate an improved policy document that addresses the security "
+    "concerns while maintaining the necessary functionality. "
+    "Return the improved policy document and a brief explanation of changes made. "
+    "Focus on least-privilege principles, resource scoping, and conditional constraints. "
+    "The policy should be production-ready and follow AWS IAM best practices."
+)
+
+ATTACK_PATH_SYSTEM_PROMPT = (
+    "You are a senior cloud security penetration tester. Given an AWS IAM policy with detected "
+    "security issues, generate realistic attack scenarios that demonstrate how a malicious actor "
+    "could exploit these permissions. For each scenario, provide:\n"
+    "1. Attack scenario description\n"
+    "2. Specific AWS CLI commands that would be used\n"
+    "3. Potential impact of the attack\n"
+    "4. Prerequisites for the attack\n\n"
+    "Focus on practical, real-world attack vectors that demonstrate the business impact. "
+    "Be specific about the AWS CLI commands and explain the attack chain step by step. "
+    "Consider privilege escalation, data exfiltration, resource manipulation, and lateral movement."
+)
+
+
+# Per-call prompts are the serialized policy context between a fixed prefix
+# and suffix, so only the context is formatted on each request
+_REC_PROMPT_PREFIX: Final[str] = "Context:\n"
+_REC_PROMPT_SUFFIX: Final[str] = (
+    "\n\nOutput format:\n- recommendations: 3-7 bullets\n- rationale: 1 short paragraph"
+)
+
+_POLICY_PROMPT_PREFIX: Final[str] = "Original Policy Context:\n"
+_POLICY_PROMPT_SUFFIX: Final[str] = (
+    "\n\nReturn policy_document as the complete improved IAM policy JSON "
+    '(with "Version": "2012-10-17" and a "Statement" list) encoded as a string, '
+    "and explanation as a brief summary of the changes made and security improvements."
+)
+
+_ATTACK_PROMPT_PREFIX: Final[str] = "Policy Context:\n"
+_ATTACK_PROMPT_SUFFIX: Final[str] = (
+    "\n\nReturn the attack scenarios, each with its steps and AWS CLI commands, "
+    "and an overall impact assessment."
+)
+
+# Both structured calls ask Gemini for JSON constrained by these schemas, so the
+# reply is parsed with a single orjson.loads. The schema subset cannot describe
+# a free-form object, so the policy document travels as a JSON-encoded string.
+_RECOMMENDED_POLICY_SCHEMA: Final[Dict[str, Any]] = {
+    "type": "object",
+    "properties": {
+        "policy_document": {"type": "string", "description": "Improved IAM policy document as a JSON string"},
+        "explanation": {"type": "string"},
+    },
+    "required": ["policy_document", "explanation"],
+}
+
+_ATTACK_PATH_SCHEMA: Final[Dict[str, Any]] = {
+    "type": "object",
+    "properties": {
+        "attack_scenarios": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "title": {"type": "string"},
+                    "description": {"type": "string"},
+                    "prerequisites": {"type": "string"},
+                    "steps": {
+                        "type": "array",
+                        "items": {
+                            "type": "object",
+                            "properties": {
+                                "step": {"type": "integer"},
+                                "description": {"type": "string"},
+                                "aws_cli_command": {"type": "string"},
+                                "explanation": {"type": "string"},
+                            },
+                            "required": ["step", "description", "aws_cli_command", "explanation"],
+                        },
+                    },
+                    "impact": {"type": "string"},
+                    "severity": {"type": "string", "enum": ["HIGH", "MEDIUM", "LOW"]},
+                },
+                "required": ["title", "description", "prerequisites", "steps", "impact", "severity"],
+            },
+        },
+        "impact_assessment": {"type": "string"},
+    },
+    "required": ["attack_scenarios", "impact_assessment"],
+}
+
+
+def _recommendations_prompt(policy_context: Dict[str, Any]) -> str:
+    return _REC_PROMPT_PREFIX + orjson.dumps(policy_context, option=orjson.OPT_INDENT_2).decode() + _REC_PROMPT_SUFFIX
+
+
+def _parse_recommendations(text: str) -> Dict[str, Any]:
+    """
+    Parse a recommendations reply into bullet recommendations and a rationale.
+    
+    Args:
+        text: Raw model output
+        
+    Returns:
+        Dictionary with recommendations and rationale
+    """
+    recommendations: List[str] = []
+    rationale: Optional[str] = None
+
+    in_recs = True
+    rationale_lines: List[str] = []
+    
+    # Single pass: strip and classify each line as it is read
+    for raw in text.splitlines():
+        line = raw.strip()
+        if not line:
+            continue
+        if line.lower().startswith("rationale"):
+            in_recs = False
+        elif in_recs:
+            if line.startswith(("-", "•")):
+                recommendations.append(line.lstrip("-• "))
+        else:
+            rationale_lines.append(line)
+
+    if not recommendations:
+        # Fallback: return whole text as rationale if parsing fails
+        rationale = text.strip() or "LLM did not return content"
+    else:
+        rationale = " ".join(rationale_lines) if rationale_lines else None
+
+    return {
+        "recommendations": recommendations[:7],
+        "rationale": rationale
+    }
+
 
 class LLMService:
     """Service class for handling LLM operations with Gemini API."""
     
+    __slots__ = (
+        "model_name",
+        "cache",
+        "_recommendations_model",
+        "_recommended_policy_model",
+        "_attack_path_model",
+        "_inflight",
+    )
+    
     def __init__(self):
         self.model_name = "gemini-flash-latest"
+        self.cache = llm_cache
+        # In-flight model calls by (cache key, refresh), shared by concurrent
+        # identical requests
+        self._inflight: Dict[Tuple[str, bool], "asyncio.Task[Dict[str, Any]]"] = {}
         self._configure_genai()
     
     def _configure_genai(self):
@@ -32,237 +192,294 @@ class LLMService:
         if not settings.gemini_api_key:
             raise RuntimeError("Gemini API key is not configured")
         
+        # Leave the transport at the SDK default: it creates one client per
+        # process over a gRPC (HTTP/2) channel that all calls multiplex on.
+        # Forcing "rest" would trade that for per-request HTTP connections.
         genai.configure(api_key=settings.gemini_api_key)
+        
+        # One model per task, each carrying its static system instruction;
+        # built once here and reused by every call
+        self._recommendations_model = genai.GenerativeModel(
+            self.model_name, system_instruction=RECOMMENDATIONS_SYSTEM_PROMPT
+        )
+        self._recommended_policy_model = genai.GenerativeModel(
+            self.model_name,
+            system_instruction=RECOMMENDED_POLICY_SYSTEM_PROMPT,
+            generation_config=genai.GenerationConfig(
+                response_mime_type="application/json", response_schema=_RECOMMENDED_POLICY_SCHEMA
+            ),
+        )
+        self._attack_path_model = genai.GenerativeModel(
+            self.model_name,
+            system_instruction=ATTACK_PATH_SYSTEM_PROMPT,
+            generation_config=genai.GenerationConfig(
+                response_mime_type="application/json", response_schema=_ATTACK_PATH_SCHEMA
+            ),
+        )
     
-    def _get_model(self):
-        """Get the configured Gemini model."""
-        return genai.GenerativeModel(self.model_name)
+    async def _singleflight(
+        self, key: Optional[str], refresh: bool, call: Callable[[], Awaitable[Dict[str, Any]]]
+    ) -> Dict[str, Any]:
+        """
+        Run call once for all concurrent callers with the same key.
+        
+        Args:
+            key: Cache key identifying the request; None runs call directly
+            refresh: Whether the callers bypass the cache; refresh calls only
+                share with other refresh calls, so they never get a result
+                that was started before they asked for a fresh one
+            call: Zero-argument coroutine function making the model call
+            
+        Returns:
+            The shared result of call
+        """
+        if key is None:
+            return await call()
+        inflight_key = (key, refresh)
+        task = self._inflight.get(inflight_key)
+        if task is None:
+            task = asyncio.ensure_future(call())
+            self._inflight[inflight_key] = task
+            
+            def _done(t: "asyncio.Task[Dict[str, Any]]") -> None:
+                self._inflight.pop(inflight_key, None)
+                # Retrieve the exception so a failure whose callers were all
+                # cancelled isn't logged as never retrieved
+                if not t.cancelled():
+                    t.exception()
+            
+            task.add_done_callback(_done)
+        # Shielded so one caller going away doesn't cancel the call for the others
+        return await asyncio.shield(task)
     
-    def generate_recommendations(self, policy_context: Dict[str, Any]) -> Dict[str, Any]:
+    async def generate_recommendations(self, policy_context: Dict[str, Any], refresh: bool = False) -> Dict[str, Any]:
         """
         Generate LLM-backed remediation recommendations using Gemini.
         
         Args:
             policy_context: Dictionary containing policy information and detected flags
+            refresh: Skip the cache lookup and always call the model; the new
+                result still replaces the cached one
             
         Returns:
             Dictionary with recommendations and rationale
         """
-        system_prompt = (
-            "You are a senior cloud security engineer. Given AWS IAM policy statements "
-            "and detected risky flags, produce specific remediation recommendations. "
-            "Favor least-privilege, resource scoping, and conditional constraints. "
-            "Return clear, concise bullet recommendations. Include a short rationale paragraph."
-            "The recommendations should be formatted in markdown format for easy readability."
-        )
-
-        prompt_parts = [
-            system_prompt,
-            "\nContext:",
-            str(policy_context),
-            "\nOutput format:\n- recommendations: 3-7 bullets\n- rationale: 1 short paragraph",
-        ]
+        cache_key = self.cache.make_key("generate_recommendations", self.model_name, policy_context)
+        if not refresh:
+            cached = await self.cache.get(cache_key)
+            if cached is not None:
+                return cached
         
+        return await self._singleflight(cache_key, refresh, lambda: self._call_recommendations(policy_context, cache_key))
+    
+    async def _call_recommendations(self, policy_context: Dict[str, Any], cache_key: Optional[str]) -> Dict[str, Any]:
         try:
-            model = self._get_model()
-            resp = model.generate_content("\n".join(prompt_parts))
+            resp = await self._recommendations_model.generate_content_async(_recommendations_prompt(policy_context))
             text = getattr(resp, "text", None) or ""
         except Exception as e:
             raise RuntimeError(f"Gemini call failed: {e}")
 
         # Parse the response
-        recommendations: List[str] = []
-        rationale: Optional[str] = None
-
-        lines = [line.strip() for line in text.splitlines() if line.strip()]
+        result = _parse_recommendations(text)
+        if result["recommendations"]:
+            await self.cache.set(cache_key, result)
+        return result
+    
+    async def stream_recommendations(
+        self, policy_context: Dict[str, Any]
+    ) -> AsyncIterator[Tuple[str, Any]]:
+        """
+        Generate recommendations, yielding text as soon as the model produces it.
+        
+        Args:
+            policy_context: Dictionary containing policy information and detected flags
+            
+        Yields:
+            ("delta", text) for each chunk of model output as it arrives,
+            ("recommendation", text) for each bullet as its line completes, then
+            ("done", result) with the same dictionary generate_recommendations
+            returns. Cached results skip the deltas.
+        """
+        cache_key = self.cache.make_key("generate_recommendations", self.model_name, policy_context)
+        cached = await self.cache.get(cache_key)
+        if cached is not None:
+            for recommendation in cached["recommendations"]:
+                yield "recommendation", recommendation
+            yield "done", cached
+            return
+        
+        try:
+            resp = await self._recommendations_model.generate_content_async(_recommendations_prompt(policy_context), stream=True)
+        except Exception as e:
+            raise RuntimeError(f"Gemini call failed: {e}")
+        
+        # Bullets can span chunks, so only complete lines are parsed; lines
+        # are split and classified as in _parse_recommendations
+        text_parts: List[str] = []
+        buffer = ""
         in_recs = True
-        rationale_lines: List[str] = []
+        emitted = 0
         
-        for line in lines:
-            if line.lower().startswith("rationale"):
-                in_recs = False
-                continue
-            if in_recs and (line.startswith("-") or line.startswith("•")):
-                recommendations.append(line.lstrip("-• "))
-            elif not in_recs:
-                rationale_lines.append(line)
-
-        if not recommendations:
-            # Fallback: return whole text as rationale if parsing fails
-            rationale = text.strip() or "LLM did not return content"
-        else:
-            rationale = " ".join(rationale_lines) if rationale_lines else None
-
-        return {
-            "recommendations": recommendations[:7],
-            "rationale": rationale
-        }
+        def bullets(lines: List[str]) -> Iterator[str]:
+            nonlocal in_recs, emitted
+            for line in lines:
+                line = line.strip()
+                if line.lower().startswith("rationale"):
+                    in_recs = False
+                elif in_recs and emitted < 7 and line.startswith(("-", "•")):
+                    emitted += 1
+                    yield line.lstrip("-• ")
+        
+        try:
+            async for chunk in resp:
+                chunk_text = getattr(chunk, "text", None) or ""
+                if not chunk_text:
+                    continue
+                yield "delta", chunk_text
+                text_parts.append(chunk_text)
+                buffer += chunk_text
+                lines = buffer.splitlines(keepends=True)
+                # Hold back the last line until its line break arrives
+                buffer = lines.pop() if lines and lines[-1].splitlines()[0] == lines[-1] else ""
+                for recommendation in bullets(lines):
+                    yield "recommendation", recommendation
+        except Exception as e:
+            raise RuntimeError(f"Gemini call failed: {e}")
+        
+        # The last line of the response usually has no line break; it is
+        # classified by the same rule as the rest
+        for recommendation in bullets([buffer]):
+            yield "recommendation", recommendation
+        
+        text = "".join(text_parts)
+        result = _parse_recommendations(text)
+        if result["recommendations"]:
+            await self.cache.set(cache_key, result)
+        yield "done", result
+    
+    async def generate_recommendations_batch(
+        self, policy_contexts: List[Dict[str, Any]], refresh: bool = False
+    ) -> List[Union[Dict[str, Any], Exception]]:
+        """
+        Generate recommendations for several policies concurrently.
+        
+        Args:
+            policy_contexts: List of policy contexts, as for generate_recommendations
+            refresh: Skip cache lookups, as for generate_recommendations
+            
+        Returns:
+            One entry per context, in order: the recommendations dictionary,
+            or the exception raised for that policy
+        """
+        return await asyncio.gather(
+            *(self.generate_recommendations(policy_context, refresh) for policy_context in policy_contexts),
+            return_exceptions=True,
+        )
     
-    def generate_recommended_policy(self, policy_context: Dict[str, Any]) -> Dict[str, Any]:
+    async def generate_recommended_policy(self, policy_context: Dict[str, Any], refresh: bool = False) -> Dict[str, Any]:
         """
         Generate a recommended policy document using Gemini based on security analysis.
         
         Args:
             policy_context: Dictionary containing original policy and security issues
+            refresh: Skip the cache lookup and always call the model; the new
+                result still replaces the cached one
             
         Returns:
             Dictionary with policy_document and explanation
         """
-        system_prompt = (
-            "You are a senior cloud security engineer. Given an AWS IAM policy with detected "
-            "security issues, generate an improved policy document that addresses the security "
-            "concerns while maintaining the necessary functionality. "
-            "Return a valid JSON policy document and a brief explanation of changes made. "
-            "Focus on least-privilege principles, resource scoping, and conditional constraints. "
-            "The policy should be production-ready and follow AWS IAM best practices."
+        cache_key = self.cache.make_key("generate_recommended_policy", self.model_name, policy_context)
+        if not refresh:
+            cached = await self.cache.get(cache_key)
+            if cached is not None:
+                return cached
+        
+        return await self._singleflight(cache_key, refresh, lambda: self._call_recommended_policy(policy_context, cache_key))
+    
+    async def _call_recommended_policy(self, policy_context: Dict[str, Any], cache_key: Optional[str]) -> Dict[str, Any]:
+        prompt = (
+            _POLICY_PROMPT_PREFIX
+            + orjson.dumps(policy_context, option=orjson.OPT_INDENT_2).decode()
+            + _POLICY_PROMPT_SUFFIX
         )
-
-        prompt_parts = [
-            system_prompt,
-            "\nOriginal Policy Context:",
-            str(policy_context),
-            "\nOutput format:\n"
-            "POLICY_JSON:\n"
-            "{\n"
-            '  "Version": "2012-10-17",\n'
-            '  "Statement": [...]\n'
-            "}\n\n"
-            "EXPLANATION:\n"
-            "Brief explanation of changes made and security improvements."
-        ]
         
         try:
-            model = self._get_model()
-            resp = model.generate_content("\n".join(prompt_parts))
+            resp = await self._recommended_policy_model.generate_content_async(prompt)
             text = getattr(resp, "text", None) or ""
         except Exception as e:
             raise RuntimeError(f"Gemini call failed: {e}")
 
-        # Parse the response to extract JSON policy and explanation
         try:
-            # Extract JSON policy - handle both raw JSON and markdown code blocks
-            json_match = re.search(r'POLICY_JSON:\s*(?:```json\s*)?(\{.*?\})\s*(?:```\s*)?(?=EXPLANATION:|$)', text, re.DOTALL)
-            if json_match:
-                policy_json_str = json_match.group(1).strip()
-                policy_document = json.loads(policy_json_str)
-            else:
-                # Fallback: try to find any JSON object in the response, including in code blocks
-                json_match = re.search(r'(?:```json\s*)?(\{.*?"Version".*?\})(?:\s*```)?', text, re.DOTALL)
-                if json_match:
-                    policy_document = json.loads(json_match.group(1).strip())
-                else:
-                    raise ValueError("No valid policy JSON found in response")
-            
-            # Extract explanation
-            explanation_match = re.search(r'EXPLANATION:\s*(.*?)$', text, re.DOTALL)
-            explanation = explanation_match.group(1).strip() if explanation_match else None
-            
-            return {
-                "policy_document": policy_document,
-                "explanation": explanation
-            }
-            
-        except (json.JSONDecodeError, ValueError) as e:
+            data = orjson.loads(text)
+            policy_document = orjson.loads(data["policy_document"])
+            if not isinstance(policy_document, dict):
+                raise ValueError("policy_document is not a JSON object")
+        except (orjson.JSONDecodeError, KeyError, TypeError, ValueError) as e:
             raise RuntimeError(f"Failed to parse recommended policy from LLM response: {e}")
+        
+        result = {
+            "policy_document": policy_document,
+            "explanation": data.get("explanation") or None
+        }
+        await self.cache.set(cache_key, result)
+        return result
     
-    def generate_attack_path(self, policy_context: Dict[str, Any]) -> Dict[str, Any]:
+    async def generate_attack_path(self, policy_context: Dict[str, Any], refresh: bool = False) -> Dict[str, Any]:
         """
         Generate attack path scenarios showing how an attacker could exploit the policy.
         
         Args:
             policy_context: Dictionary containing policy context and security issues
+            refresh: Skip the cache lookup and always call the model; the new
+                result still replaces the cached one
             
         Returns:
             Dictionary with attack_scenarios and impact_assessment
         """
-        system_prompt = (
-            "You are a senior cloud security penetration tester. Given an AWS IAM policy with detected "
-            "security issues, generate realistic attack scenarios that demonstrate how a malicious actor "
-            "could exploit these permissions. For each scenario, provide:\n"
-            "1. Attack scenario description\n"
-            "2. Specific AWS CLI commands that would be used\n"
-            "3. Potential impact of the attack\n"
-            "4. Prerequisites for the attack\n\n"
-            "Focus on practical, real-world attack vectors that demonstrate the business impact. "
-            "Be specific about the AWS CLI commands and explain the attack chain step by step. "
-            "Consider privilege escalation, data exfiltration, resource manipulation, and lateral movement."
+        cache_key = self.cache.make_key("generate_attack_path", self.model_name, policy_context)
+        if not refresh:
+            cached = await self.cache.get(cache_key)
+            if cached is not None:
+                return cached
+        
+        return await self._singleflight(cache_key, refresh, lambda: self._call_attack_path(policy_context, cache_key))
+    
+    async def _call_attack_path(self, policy_context: Dict[str, Any], cache_key: Optional[str]) -> Dict[str, Any]:
+        prompt = (
+            _ATTACK_PROMPT_PREFIX
+            + orjson.dumps(policy_context, option=orjson.OPT_INDENT_2).decode()
+            + _ATTACK_PROMPT_SUFFIX
         )
-
-        prompt_parts = [
-            system_prompt,
-            "\nPolicy Context:",
-            str(policy_context),
-            "\nOutput format (JSON):\n"
-            "{\n"
-            '  "attack_scenarios": [\n'
-            "    {\n"
-            '      "title": "Attack scenario name",\n'
-            '      "description": "Detailed description of the attack",\n'
-            '      "prerequisites": "What the attacker needs",\n'
-            '      "steps": [\n'
-            "        {\n"
-            '          "step": 1,\n'
-            '          "description": "Step description",\n'
-            '          "aws_cli_command": "aws command here",\n'
-            '          "explanation": "Why this command works"\n'
-            "        }\n"
-            "      ],\n"
-            '      "impact": "Business impact description",\n'
-            '      "severity": "HIGH|MEDIUM|LOW"\n'
-            "    }\n"
-            "  ],\n"
-            '  "impact_assessment": "Overall security impact summary"\n'
-            "}"
-        ]
         
         try:
-            model = self._get_model()
-            resp = model.generate_content("\n".join(prompt_parts))
+            resp = await self._attack_path_model.generate_content_async(prompt)
             text = getattr(resp, "text", None) or ""
         except Exception as e:
             raise RuntimeError(f"Gemini call failed: {e}")
 
-        # Parse the response to extract attack scenarios
         try:
-            # Try to extract JSON from the response
-            json_match = re.search(r'\{.*"attack_scenarios".*\}', text, re.DOTALL)
-            if json_match:
-                attack_data = json.loads(json_match.group(0))
-                attack_scenarios = attack_data.get("attack_scenarios", [])
-                impact_assessment = attack_data.get("impact_assessment")
-            else:
-                # Fallback: create a simple structure from the text
-                attack_scenarios = [{
-                    "title": "Attack Analysis",
+            attack_data = orjson.loads(text)
+            result = {
+                "attack_scenarios": attack_data["attack_scenarios"],
+                "impact_assessment": attack_data.get("impact_assessment")
+            }
+        except (orjson.JSONDecodeError, KeyError, TypeError):
+            # Return the raw text as a single scenario; not cached, so the
+            # next request tries the model again
+            return {
+                "attack_scenarios": [{
+                    "title": "Security Analysis",
                     "description": text,
-                    "prerequisites": "Valid AWS credentials with the analyzed policy permissions",
+                    "prerequisites": "Valid AWS credentials",
                     "steps": [],
-                    "impact": "Potential security compromise based on policy permissions",
+                    "impact": "Review the analysis for potential security risks",
                     "severity": "MEDIUM"
-                }]
-                impact_assessment = "Unable to parse structured attack scenarios from AI response"
-            
-            return {
-                "attack_scenarios": attack_scenarios,
-                "impact_assessment": impact_assessment
-            }
-            
-        except (json.JSONDecodeError, ValueError) as e:
-            # Return the raw text as a single scenario
-            attack_scenarios = [{
-                "title": "Security Analysis",
-                "description": text,
-                "prerequisites": "Valid AWS credentials",
-                "steps": [],
-                "impact": "Review the analysis for potential security risks",
-                "severity": "MEDIUM"
-            }]
-            impact_assessment = "Raw analysis provided due to parsing issues"
-            
-            return {
-                "attack_scenarios": attack_scenarios,
-                "impact_assessment": impact_assessment
+                }],
+                "impact_assessment": "Raw analysis provided due to parsing issues"
             }
+        
+        await self.cache.set(cache_key, result)
+        return result
 
 
 # Create a singleton instance
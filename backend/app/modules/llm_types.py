@@ -0,0 +1,51 @@
+"""
+LLM Types Module
+
+Request-scoped inputs passed from the LLM routes to the policy and attack
+services.
+"""
+
+from dataclasses import dataclass
+from typing import Any, Dict, List
+
+
+@dataclass(slots=True, frozen=True)
+class LLMContext:
+    """One policy and its detected issues, built once per request."""
+
+    policy_name: str
+    policy_id: str
+    statements: List[Dict[str, Any]]
+    detected_flags: List[Dict[str, Any]]
+    organization_context: str = ""
+
+    def _policy(self) -> Dict[str, Any]:
+        return {
+            "policy_name": self.policy_name,
+            "policy_id": self.policy_id,
+            "statements": self.statements,
+        }
+
+    def recommendations_context(self) -> Dict[str, Any]:
+        """Return the context LLMService.generate_recommendations expects."""
+        return {
+            **self._policy(),
+            "detected_flags": self.detected_flags,
+            "organization_context": self.organization_context,
+        }
+
+    def recommended_policy_context(self) -> Dict[str, Any]:
+        """Return the context LLMService.generate_recommended_policy expects."""
+        return {
+            "original_policy": self._policy(),
+            "detected_security_issues": self.detected_flags,
+            "organization_context": self.organization_context,
+        }
+
+    def attack_path_context(self) -> Dict[str, Any]:
+        """Return the context LLMService.generate_attack_path expects."""
+        return {
+            "policy_context": self._policy(),
+            "detected_security_issues": self.detected_flags,
+            "organization_context": self.organization_context,
+        }
@@ -5,67 +5,123 @@ Handles policy-related business logic including recommendation processing,
 policy document generation, and database operations for policies.
 """
 
-from typing import Any, Dict, List, Optional
-from sqlalchemy.orm import Session
+from typing import Any, Dict, List, Optional, Tuple
+from uuid import UUID
+import asyncio
+
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.crud import (
     upsert_llm_recommendation, 
+    upsert_llm_recommendations,
     get_llm_recommendation, 
+    get_llm_recommendations_for_policies,
     get_current_upload_id, 
     upsert_recommended_policy, 
-    get_recommended_policy
+    get_recommended_policy,
+    get_recommended_policies_for_policies,
+    upsert_policy_analysis
 )
+from app.models import RecommendedPolicy
 from app.schemas import LLMRecommendationResponse, RecommendedPolicyResponse
 from app.modules.llm_service import llm_service
+from app.modules.llm_types import LLMContext
 
 
 class PolicyService:
     """Service class for handling policy-related operations."""
     
+    __slots__ = ("llm_service",)
+    
     def __init__(self):
         self.llm_service = llm_service
     
-    def generate_recommendations(self, policy_context: Dict[str, Any]) -> Dict[str, Any]:
+    @staticmethod
+    def _recommendation_response(rec) -> LLMRecommendationResponse:
+        return LLMRecommendationResponse(
+            upload_id=rec.upload_id,
+            policy_id=rec.policy_id,
+            policy_name=rec.policy_name,
+            recommendations=rec.recommendations,
+            rationale=rec.rationale,
+            created_at=rec.created_at,
+            updated_at=rec.updated_at,
+        )
+    
+    @staticmethod
+    def _recommended_policy_response(rec) -> RecommendedPolicyResponse:
+        return RecommendedPolicyResponse(
+            upload_id=rec.upload_id,
+            policy_id=rec.policy_id,
+            policy_name=rec.policy_name,
+            policy_document=rec.policy_document,
+            explanation=rec.explanation,
+            created_at=rec.created_at,
+            updated_at=rec.updated_at,
+        )
+    
+    async def generate_recommendations(self, policy_context: LLMContext, refresh: bool = False) -> Dict[str, Any]:
         """
         Generate LLM-backed remediation recommendations.
         
         Args:
-            policy_context: Dictionary containing policy information and detected flags
+            policy_context: Policy and detected flags to analyze
+            refresh: Bypass the LLM result cache
             
         Returns:
             Dictionary with recommendations and rationale
         """
-        return self.llm_service.generate_recommendations(policy_context)
+        return await self.llm_service.generate_recommendations(policy_context.recommendations_context(), refresh)
     
-    def generate_recommended_policy(self, policy_context: Dict[str, Any], db: Session) -> Dict[str, Any]:
+    async def generate_recommended_policy(self, policy_context: LLMContext, refresh: bool = False) -> Dict[str, Any]:
         """
-        Generate a recommended policy document and store it in the database.
+        Generate a recommended policy document without storing it.
         
         Args:
-            policy_context: Dictionary containing original policy and security issues
-            db: Database session
+            policy_context: Policy and detected flags to analyze
+            refresh: Bypass the LLM result cache
             
         Returns:
             Dictionary with policy_document and explanation
         """
-        # Generate the policy using LLM service
-        result = self.llm_service.generate_recommended_policy(policy_context)
+        return await self.llm_service.generate_recommended_policy(policy_context.recommended_policy_context(), refresh)
+    
+    async def store_recommended_policy(self, upload_id: UUID, policy_context: LLMContext,
+                                       generated: Dict[str, Any], db: AsyncSession) -> RecommendedPolicy:
+        """
+        Store a generated recommended policy for an upload.
         
-        # Store the recommended policy in the database
-        current_upload_id = get_current_upload_id(db)
+        Args:
+            upload_id: Upload ID
+            policy_context: Policy the document was generated for
+            generated: Dictionary with policy_document and explanation
+            db: Database session
+            
+        Returns:
+            The stored row, timestamps included
+        """
+        return await upsert_recommended_policy(
+            db=db,
+            upload_id=upload_id,
+            policy_id=policy_context.policy_id,
+            policy_name=policy_context.policy_name,
+            policy_document=generated["policy_document"],
+            explanation=generated["explanation"],
+        )
+    
+    async def _generate_and_store_recommended_policy(
+        self, policy_context: LLMContext, db: AsyncSession, refresh: bool
+    ) -> Tuple[Dict[str, Any], Optional[RecommendedPolicy]]:
+        result = await self.generate_recommended_policy(policy_context, refresh)
+        
+        stored_policy = None
+        current_upload_id = await get_current_upload_id(db)
         if current_upload_id:
-            upsert_recommended_policy(
-                db=db,
-                upload_id=current_upload_id,
-                policy_id=policy_context["original_policy"]["policy_id"],
-                policy_name=policy_context["original_policy"]["policy_name"],
-                policy_document=result["policy_document"],
-                explanation=result["explanation"],
-            )
+            stored_policy = await self.store_recommended_policy(current_upload_id, policy_context, result, db)
         
-        return result
+        return result, stored_policy
     
-    def get_stored_recommended_policy(self, upload_id: str, policy_id: str, db: Session) -> Optional[RecommendedPolicyResponse]:
+    async def get_stored_recommended_policy(self, upload_id: UUID, policy_id: str, db: AsyncSession) -> Optional[RecommendedPolicyResponse]:
         """
         Get a stored recommended policy from the database.
         
@@ -77,23 +133,31 @@ class PolicyService:
         Returns:
             RecommendedPolicyResponse or None if not found
         """
-        rec = get_recommended_policy(db, upload_id, policy_id)
+        rec = await get_recommended_policy(db, upload_id, policy_id)
         if not rec:
             return None
         
-        return RecommendedPolicyResponse(
-            upload_id=rec.upload_id,
-            policy_id=rec.policy_id,
-            policy_name=rec.policy_name,
-            policy_document=rec.policy_document,
-            explanation=rec.explanation,
-            created_at=rec.created_at.isoformat() if rec.created_at else None,
-            updated_at=rec.updated_at.isoformat() if rec.updated_at else None,
-        )
+        return self._recommended_policy_response(rec)
     
-    def persist_recommended_policy(self, upload_id: str, policy_id: str, policy_name: str, 
-                                 policy_document: Dict[str, Any], explanation: Optional[str], 
-                                 db: Session) -> RecommendedPolicyResponse:
+    async def get_stored_recommended_policies(self, upload_id: UUID, policy_ids: List[str], db: AsyncSession) -> Dict[str, RecommendedPolicyResponse]:
+        """
+        Get stored recommended policies for several policies in one query.
+        
+        Args:
+            upload_id: Upload ID
+            policy_ids: Policy IDs to look up
+            db: Database session
+            
+        Returns:
+            Dictionary of RecommendedPolicyResponse keyed by policy ID;
+            policies without a stored recommendation are omitted
+        """
+        recs = await get_recommended_policies_for_policies(db, upload_id, policy_ids)
+        return {policy_id: self._recommended_policy_response(rec) for policy_id, rec in recs.items()}
+    
+    async def persist_recommended_policy(self, upload_id: UUID, policy_id: str, policy_name: str, 
+                                       policy_document: Dict[str, Any], explanation: Optional[str], 
+                                       db: AsyncSession) -> RecommendedPolicyResponse:
         """
         Persist a recommended policy to the database.
         
@@ -108,7 +172,7 @@ class PolicyService:
         Returns:
             RecommendedPolicyResponse
         """
-        rec = upsert_recommended_policy(
+        rec = await upsert_recommended_policy(
             db=db,
             upload_id=upload_id,
             policy_id=policy_id,
@@ -117,49 +181,37 @@ class PolicyService:
             explanation=explanation,
         )
         
-        return RecommendedPolicyResponse(
-            upload_id=rec.upload_id,
-            policy_id=rec.policy_id,
-            policy_name=rec.policy_name,
-            policy_document=rec.policy_document,
-            explanation=rec.explanation,
-            created_at=rec.created_at.isoformat() if rec.created_at else None,
-            updated_at=rec.updated_at.isoformat() if rec.updated_at else None,
-        )
+        return self._recommended_policy_response(rec)
     
-    def regenerate_recommended_policy(self, policy_context: Dict[str, Any], db: Session) -> Dict[str, Any]:
+    async def regenerate_recommended_policy(self, policy_context: LLMContext, db: AsyncSession) -> Dict[str, Any]:
         """
         Regenerate and store a recommended policy.
         
         Args:
-            policy_context: Dictionary containing policy context
+            policy_context: Policy and detected flags to analyze
             db: Database session
             
         Returns:
             Dictionary with policy_document and explanation
         """
         # Generate the recommended policy (which will automatically store it)
-        generated = self.generate_recommended_policy(policy_context, db)
+        generated, stored_policy = await self._generate_and_store_recommended_policy(policy_context, db, refresh=True)
         
-        # Fetch it from the database to get the timestamps
-        current_upload_id = get_current_upload_id(db)
-        if current_upload_id:
-            stored_policy = get_recommended_policy(db, current_upload_id, policy_context["original_policy"]["policy_id"])
-            if stored_policy:
-                return {
-                    "policy_document": stored_policy.policy_document,
-                    "explanation": stored_policy.explanation,
-                    "upload_id": stored_policy.upload_id,
-                    "policy_id": stored_policy.policy_id,
-                    "policy_name": stored_policy.policy_name,
-                    "created_at": stored_policy.created_at.isoformat() if stored_policy.created_at else None,
-                    "updated_at": stored_policy.updated_at.isoformat() if stored_policy.updated_at else None,
-                }
+        if stored_policy:
+            return {
+                "policy_document": stored_policy.policy_document,
+                "explanation": stored_policy.explanation,
+                "upload_id": stored_policy.upload_id,
+                "policy_id": stored_policy.policy_id,
+                "policy_name": stored_policy.policy_name,
+                "created_at": stored_policy.created_at,
+                "updated_at": stored_policy.updated_at,
+            }
         
         # Fallback to the generated response
         return generated
     
-    def get_stored_recommendation(self, upload_id: str, policy_id: str, db: Session) -> Optional[LLMRecommendationResponse]:
+    async def get_stored_recommendation(self, upload_id: UUID, policy_id: str, db: AsyncSession) -> Optional[LLMRecommendationResponse]:
         """
         Get a stored recommendation from the database.
         
@@ -171,23 +223,31 @@ class PolicyService:
         Returns:
             LLMRecommendationResponse or None if not found
         """
-        rec = get_llm_recommendation(db, upload_id, policy_id)
+        rec = await get_llm_recommendation(db, upload_id, policy_id)
         if not rec:
             return None
         
-        return LLMRecommendationResponse(
-            upload_id=rec.upload_id,
-            policy_id=rec.policy_id,
-            policy_name=rec.policy_name,
-            recommendations=rec.recommendations,
-            rationale=rec.rationale,
-            created_at=rec.created_at.isoformat() if rec.created_at else None,
-            updated_at=rec.updated_at.isoformat() if rec.updated_at else None,
-        )
+        return self._recommendation_response(rec)
     
-    def persist_recommendation(self, upload_id: str, policy_id: str, policy_name: str, 
-                             recommendations: List[str], rationale: Optional[str], 
-                             db: Session) -> LLMRecommendationResponse:
+    async def get_stored_recommendations(self, upload_id: UUID, policy_ids: List[str], db: AsyncSession) -> Dict[str, LLMRecommendationResponse]:
+        """
+        Get stored recommendations for several policies in one query.
+        
+        Args:
+            upload_id: Upload ID
+            policy_ids: Policy IDs to look up
+            db: Database session
+            
+        Returns:
+            Dictionary of LLMRecommendationResponse keyed by policy ID;
+            policies without a stored recommendation are omitted
+        """
+        recs = await get_llm_recommendations_for_policies(db, upload_id, policy_ids)
+        return {policy_id: self._recommendation_response(rec) for policy_id, rec in recs.items()}
+    
+    async def persist_recommendation(self, upload_id: UUID, policy_id: str, policy_name: str, 
+                                   recommendations: List[str], rationale: Optional[str], 
+                                   db: AsyncSession) -> LLMRecommendationResponse:
         """
         Persist a recommendation to the database.
         
@@ -202,7 +262,7 @@ class PolicyService:
         Returns:
             LLMRecommendationResponse
         """
-        rec = upsert_llm_recommendation(
+        rec = await upsert_llm_recommendation(
             db=db,
             upload_id=upload_id,
             policy_id=policy_id,
@@ -211,52 +271,165 @@ class PolicyService:
             rationale=rationale,
         )
         
-        return LLMRecommendationResponse(
-            upload_id=rec.upload_id,
-            policy_id=rec.policy_id,
-            policy_name=rec.policy_name,
-            recommendations=rec.recommendations,
-            rationale=rec.rationale,
-            created_at=rec.created_at.isoformat() if rec.created_at else None,
-            updated_at=rec.updated_at.isoformat() if rec.updated_at else None,
+        return self._recommendation_response(rec)
+    
+    async def store_generated_recommendations(self, policy_context: LLMContext, generated: Dict[str, Any],
+                                              db: AsyncSession) -> Optional[LLMRecommendationResponse]:
+        """
+        Store recommendations that were generated outside this service, e.g. streamed.
+        
+        Args:
+            policy_context: Policy the recommendations were generated for
+            generated: Dictionary with recommendations and rationale
+            db: Database session
+            
+        Returns:
+            LLMRecommendationResponse, or None if there is no current upload
+        """
+        current_upload_id = await get_current_upload_id(db)
+        if not current_upload_id:
+            return None
+        
+        rec = await upsert_llm_recommendation(
+            db=db,
+            upload_id=current_upload_id,
+            policy_id=policy_context.policy_id,
+            policy_name=policy_context.policy_name,
+            recommendations=generated["recommendations"],
+            rationale=generated["rationale"],
         )
+        
+        return self._recommendation_response(rec)
     
-    def regenerate_recommendations(self, policy_context: Dict[str, Any], db: Session) -> LLMRecommendationResponse:
+    async def regenerate_recommendations(self, policy_context: LLMContext, db: AsyncSession) -> Optional[LLMRecommendationResponse]:
         """
         Regenerate and store recommendations.
         
         Args:
-            policy_context: Dictionary containing policy context
+            policy_context: Policy and detected flags to analyze
             db: Database session
             
         Returns:
-            LLMRecommendationResponse
+            LLMRecommendationResponse, or None if there is no current upload
+            to store it under
         """
+        # Checked up front so Gemini isn't called for a result that can't be stored
+        current_upload_id = await get_current_upload_id(db)
+        if not current_upload_id:
+            return None
+        
         # Generate recommendations using LLM service
-        generated = self.generate_recommendations(policy_context)
+        generated = await self.generate_recommendations(policy_context, refresh=True)
         
         # Store in database
-        current_upload_id = get_current_upload_id(db)
-        upload_id = current_upload_id or ""
-        
-        rec = upsert_llm_recommendation(
+        rec = await upsert_llm_recommendation(
             db=db,
-            upload_id=upload_id,
-            policy_id=policy_context["policy_id"],
-            policy_name=policy_context["policy_name"],
+            upload_id=current_upload_id,
+            policy_id=policy_context.policy_id,
+            policy_name=policy_context.policy_name,
             recommendations=generated["recommendations"],
             rationale=generated["rationale"],
         )
         
-        return LLMRecommendationResponse(
-            upload_id=rec.upload_id,
-            policy_id=rec.policy_id,
-            policy_name=rec.policy_name,
-            recommendations=rec.recommendations,
-            rationale=rec.rationale,
-            created_at=rec.created_at.isoformat() if rec.created_at else None,
-            updated_at=rec.updated_at.isoformat() if rec.updated_at else None,
+        return self._recommendation_response(rec)
+    
+    async def regenerate_recommendations_many(
+        self, policy_contexts: List[LLMContext], db: AsyncSession
+    ) -> Optional[Tuple[Dict[str, LLMRecommendationResponse], Dict[str, str]]]:
+        """
+        Regenerate recommendations for several policies concurrently and store them.
+        
+        Args:
+            policy_contexts: List of policy contexts, as for regenerate_recommendations
+            db: Database session
+            
+        Returns:
+            Tuple of (responses keyed by policy ID, error messages keyed by
+            policy ID for policies whose generation failed), or None if there
+            is no current upload to store them under
+        """
+        # Checked up front so no Gemini calls are made for results that can't be stored
+        current_upload_id = await get_current_upload_id(db)
+        if not current_upload_id:
+            return None
+        
+        # The LLM calls overlap; a failure for one policy doesn't sink the rest
+        results = await self.llm_service.generate_recommendations_batch(
+            [policy_context.recommendations_context() for policy_context in policy_contexts], refresh=True
         )
+        
+        errors: Dict[str, str] = {}
+        rows: List[Dict[str, Any]] = []
+        for policy_context, result in zip(policy_contexts, results):
+            if isinstance(result, Exception):
+                errors[policy_context.policy_id] = str(result)
+                continue
+            rows.append({
+                "upload_id": current_upload_id,
+                "policy_id": policy_context.policy_id,
+                "policy_name": policy_context.policy_name,
+                "recommendations": result["recommendations"],
+                "rationale": result["rationale"],
+            })
+        
+        # Store all successful results with a single upsert
+        recs = await upsert_llm_recommendations(db, rows)
+        return {rec.policy_id: self._recommendation_response(rec) for rec in recs}, errors
+    
+    async def analyze_policy_full(self, policy_context: LLMContext, db: AsyncSession,
+                                  refresh: bool = False) -> Dict[str, Any]:
+        """
+        Run the recommendations, recommended policy and attack path analyses
+        for one policy concurrently and store all three together.
+        
+        Args:
+            policy_context: Policy and detected flags to analyze
+            db: Database session
+            refresh: Bypass the LLM result cache
+            
+        Returns:
+            Dictionary with recommendations, recommended_policy and attack_path
+            results; attack_path carries the stored row's fields when there is
+            a current upload
+        """
+        # The three calls share no output, so the wall time is the slowest one
+        recommendations, recommended_policy, attack_path = await asyncio.gather(
+            self.llm_service.generate_recommendations(policy_context.recommendations_context(), refresh),
+            self.llm_service.generate_recommended_policy(policy_context.recommended_policy_context(), refresh),
+            self.llm_service.generate_attack_path(policy_context.attack_path_context(), refresh),
+        )
+        
+        attack_path_result = {
+            "upload_id": None,
+            "policy_id": policy_context.policy_id,
+            "policy_name": policy_context.policy_name,
+            **attack_path,
+        }
+        
+        current_upload_id = await get_current_upload_id(db)
+        if current_upload_id:
+            keys = {
+                "upload_id": current_upload_id,
+                "policy_id": policy_context.policy_id,
+                "policy_name": policy_context.policy_name,
+            }
+            _, _, stored_attack_path = await upsert_policy_analysis(
+                db,
+                recommendation={**keys, **recommendations},
+                recommended_policy={**keys, **recommended_policy},
+                attack_path={**keys, **attack_path},
+            )
+            attack_path_result.update(
+                upload_id=current_upload_id,
+                created_at=stored_attack_path.created_at,
+                updated_at=stored_attack_path.updated_at,
+            )
+        
+        return {
+            "recommendations": recommendations,
+            "recommended_policy": recommended_policy,
+            "attack_path": attack_path_result,
+        }
 
 
 # Create a singleton instance
@@ -1,79 +1,103 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from typing import Dict, Any
+from fastapi import APIRouter, Depends, HTTPException, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+from pydantic import BaseModel, Field
+from typing import Any, Awaitable, Callable, List
+import orjson
 
+from app.cache import cache_enabled, get_cached, iam_key, set_cached
 from app.database import get_db
-from app.crud import get_current_upload_id, get_user_by_id, get_role_by_id, get_policy_by_id, get_group_by_id
+from app.crud import (
+    get_current_upload_id,
+    get_user_by_id,
+    get_role_by_id,
+    get_policy_by_id,
+    get_group_by_id,
+    get_users_by_ids,
+    get_roles_by_ids,
+    get_policies_by_ids,
+    get_groups_by_ids
+)
 
 router = APIRouter()
 
+
+class IdsRequest(BaseModel):
+    # Bounds the IN list and the cache MGET a single request can trigger
+    ids: List[str] = Field(..., max_length=500)
+
+
+def _json_response(payload: Any) -> Response:
+    # The rows are already plain JSON types, so they are serialized with orjson
+    # directly rather than through FastAPI's jsonable_encoder
+    return Response(orjson.dumps(payload), media_type="application/json")
+
+
+async def _cached_entity(
+    db: AsyncSession,
+    kind: str,
+    entity_id: str,
+    fetch: Callable[[AsyncSession, str], Awaitable[Any]],
+    not_found: str,
+) -> Response:
+    """Serve an entity of the current upload through the Redis lookaside cache"""
+    key = None
+    if cache_enabled():
+        upload_id = await get_current_upload_id(db)
+        if upload_id:
+            key = iam_key(kind, upload_id, entity_id)
+            cached = await get_cached(key)
+            if cached is not None:
+                return Response(cached, media_type="application/json")
+
+    row = await fetch(db, entity_id)
+    if not row:
+        raise HTTPException(status_code=404, detail=not_found)
+
+    entity = dict(row)
+    entity_upload_id = entity.pop("upload_id")
+    body = orjson.dumps(entity)
+    # The current upload can change between the two lookups; only cache rows
+    # that belong to the upload named in the key
+    if key is not None and entity_upload_id == upload_id:
+        await set_cached(key, body)
+    return Response(body, media_type="application/json")
+
 @router.get("/users/{user_id}")
-async def get_user(user_id: str, db: Session = Depends(get_db)):
+async def get_user(user_id: str, db: AsyncSession = Depends(get_db)):
     """Get a specific user from the current upload"""
-    user = get_user_by_id(db, user_id)
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-
-    return {
-        "UserId": user.user_id,
-        "UserName": user.user_name,
-        "Arn": user.arn,
-        "CreateDate": user.create_date,
-        "AttachedManagedPolicies": user.attached_managed_policies,
-        "GroupList": user.group_list,
-        "UserPolicyList": user.user_policy_list,
-        "Tags": user.tags
-    }
+    return await _cached_entity(db, "user", user_id, get_user_by_id, "User not found")
+
+@router.post("/users/batch")
+async def get_users(body: IdsRequest, db: AsyncSession = Depends(get_db)):
+    """Get several users from the current upload, keyed by user ID (unknown IDs are omitted)"""
+    return _json_response({row["UserId"]: dict(row) for row in await get_users_by_ids(db, body.ids)})
 
 @router.get("/roles/{role_id}")
-async def get_role(role_id: str, db: Session = Depends(get_db)):
+async def get_role(role_id: str, db: AsyncSession = Depends(get_db)):
     """Get a specific role from the current upload"""
-    role = get_role_by_id(db, role_id)
-    if not role:
-        raise HTTPException(status_code=404, detail="Role not found")
-
-    return {
-        "RoleId": role.role_id,
-        "RoleName": role.role_name,
-        "Arn": role.arn,
-        "CreateDate": role.create_date,
-        "AssumeRolePolicyDocument": role.assume_role_policy_document,
-        "AttachedManagedPolicies": role.attached_managed_policies,
-        "RolePolicyList": role.role_policy_list,
-        "Tags": role.tags
-    }
+    return await _cached_entity(db, "role", role_id, get_role_by_id, "Role not found")
+
+@router.post("/roles/batch")
+async def get_roles(body: IdsRequest, db: AsyncSession = Depends(get_db)):
+    """Get several roles from the current upload, keyed by role ID (unknown IDs are omitted)"""
+    return _json_response({row["RoleId"]: dict(row) for row in await get_roles_by_ids(db, body.ids)})
 
 @router.get("/policies/{policy_id}")
-async def get_policy(policy_id: str, db: Session = Depends(get_db)):
+async def get_policy(policy_id: str, db: AsyncSession = Depends(get_db)):
     """Get a specific policy from the current upload"""
-    policy = get_policy_by_id(db, policy_id)
-    if not policy:
-        raise HTTPException(status_code=404, detail="Policy not found")
-
-    return {
-        "PolicyId": policy.policy_id,
-        "PolicyName": policy.policy_name,
-        "Arn": policy.arn,
-        "CreateDate": policy.create_date,
-        "DefaultVersionId": policy.default_version_id,
-        "PolicyVersionList": policy.policy_version_list,
-        "AttachmentCount": policy.attachment_count,
-        "IsAttachable": policy.is_attachable == "true",
-        "Description": policy.description
-    }
+    return await _cached_entity(db, "policy", policy_id, get_policy_by_id, "Policy not found")
+
+@router.post("/policies/batch")
+async def get_policies(body: IdsRequest, db: AsyncSession = Depends(get_db)):
+    """Get several policies from the current upload, keyed by policy ID (unknown IDs are omitted)"""
+    return _json_response({row["PolicyId"]: dict(row) for row in await get_policies_by_ids(db, body.ids)})
 
 @router.get("/groups/{group_id}")
-async def get_group(group_id: str, db: Session = Depends(get_db)):
+async def get_group(group_id: str, db: AsyncSession = Depends(get_db)):
     """Get a specific group from the current upload"""
-    group = get_group_by_id(db, group_id)
-    if not group:
-        raise HTTPException(status_code=404, detail="Group not found")
-
-    return {
-        "GroupId": group.group_id,
-        "GroupName": group.group_name,
-        "Arn": group.arn,
-        "CreateDate": group.create_date,
-        "AttachedManagedPolicies": group.attached_managed_policies,
-        "GroupPolicyList": group.group_policy_list
-    }
+    return await _cached_entity(db, "group", group_id, get_group_by_id, "Group not found")
+
+@router.post("/groups/batch")
+async def get_groups(body: IdsRequest, db: AsyncSession = Depends(get_db)):
+    """Get several groups from the current upload, keyed by group ID (unknown IDs are omitted)"""
+    return _json_response({row["GroupId"]: dict(row) for row in await get_groups_by_ids(db, body.ids)})
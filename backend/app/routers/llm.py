@@ -1,16 +1,35 @@
-from fastapi import APIRouter, HTTPException, Depends
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, BackgroundTasks, HTTPException, Depends
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel
-from typing import Any, Dict, List, Optional
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+from uuid import UUID
+import orjson
 
 from app.config import settings
-from app.database import get_db
+from app.crud import get_current_upload_id
+from app.database import SessionLocal, get_db
 from app.schemas import LLMRecommendationResponse, RecommendedPolicyResponse, AttackPathResponse
 from app.modules.policy_service import policy_service
 from app.modules.attack_service import attack_service
+from app.modules.llm_cache import llm_cache
+from app.modules.llm_service import llm_service
+from app.modules.llm_types import LLMContext
 
 
-router = APIRouter()
+# Settings are loaded once at import, so the flag can't change while the
+# process runs
+_LLM_DISABLED: bool = settings.llm_disabled
+
+
+async def require_llm_enabled() -> None:
+    """Reject every LLM route with a 503 when the LLM is disabled by configuration."""
+    if _LLM_DISABLED:
+        raise HTTPException(status_code=503, detail="LLM is disabled by configuration")
+
+
+# With the LLM enabled the routes carry no dependency, so requests skip the check
+router = APIRouter(dependencies=[Depends(require_llm_enabled)] if _LLM_DISABLED else [])
 
 
 class PolicyContext(BaseModel):
@@ -35,6 +54,21 @@ class RecommendedPolicyResponse(BaseModel):
     explanation: Optional[str] = None
 
 
+class PolicyBatchRequest(BaseModel):
+    upload_id: UUID
+    policy_ids: List[str]
+
+
+def _llm_context(payload: RecommendationRequest) -> LLMContext:
+    """Build the services' input for a request; payload fields are referenced, not copied."""
+    policy = payload.policy
+    return LLMContext(
+        policy_name=policy.policy_name,
+        policy_id=policy.policy_id,
+        statements=policy.statements,
+        detected_flags=policy.detected_flags,
+        organization_context=payload.organization_context or "",
+    )
 
 
 @router.post("/recommendations", response_model=RecommendationResponse)
@@ -44,19 +78,10 @@ async def generate_recommendations(payload: RecommendationRequest):
     Expects policy context (name, id, statements, detected flags) and returns
     concise, actionable recommendations tailored to least-privilege hardening.
     """
-    if settings.llm_disabled:
-        raise HTTPException(status_code=503, detail="LLM is disabled by configuration")
-    
     try:
-        policy_context = {
-            "policy_name": payload.policy.policy_name,
-            "policy_id": payload.policy.policy_id,
-            "statements": payload.policy.statements,
-            "detected_flags": payload.policy.detected_flags,
-            "organization_context": payload.organization_context or "",
-        }
+        policy_context = _llm_context(payload)
         
-        result = policy_service.generate_recommendations(policy_context)
+        result = await policy_service.generate_recommendations(policy_context)
         return RecommendationResponse(
             recommendations=result["recommendations"],
             rationale=result["rationale"]
@@ -65,51 +90,96 @@ async def generate_recommendations(payload: RecommendationRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+def _sse(event: str, data: Any) -> bytes:
+    return b"event: " + event.encode() + b"\ndata: " + orjson.dumps(data) + b"\n\n"
+
+
+@router.post("/recommendations/stream")
+async def stream_recommendations(payload: RecommendationRequest):
+    """Stream recommendations as Server-Sent Events while Gemini generates them.
+
+    Emits a ``delta`` event with each chunk of raw model text as it arrives, a
+    ``recommendation`` event per bullet as soon as it is complete, then a
+    ``done`` event carrying the full ``{recommendations, rationale}`` result.
+    The final result is stored for the current upload after ``done`` is sent.
+    Failures after the stream has started are reported as an ``error`` event.
+    """
+    policy_context = _llm_context(payload)
+    
+    async def events() -> AsyncIterator[bytes]:
+        result = None
+        try:
+            async for event, data in llm_service.stream_recommendations(policy_context.recommendations_context()):
+                yield _sse(event, data)
+                if event == "done":
+                    result = data
+        except RuntimeError as e:
+            yield _sse("error", {"detail": str(e)})
+            return
+        
+        # The request's session is not kept open for the life of the stream
+        if result is not None and result["recommendations"]:
+            try:
+                async with SessionLocal() as db:
+                    await policy_service.store_generated_recommendations(policy_context, result, db)
+            except Exception as e:
+                yield _sse("error", {"detail": f"Failed to store recommendations: {e}"})
+    
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+async def _store_in_background(store: Callable[..., Awaitable[Any]], *args: Any) -> None:
+    # Background tasks run after the response is sent, when the request's
+    # session is already closed, so the write gets a session of its own
+    async with SessionLocal() as db:
+        await store(*args, db)
+
+
 @router.post("/recommended-policy", response_model=RecommendedPolicyResponse)
-async def generate_recommended_policy(payload: RecommendationRequest, db: Session = Depends(get_db)):
+async def generate_recommended_policy(payload: RecommendationRequest, background_tasks: BackgroundTasks,
+                                      db: AsyncSession = Depends(get_db)):
     """Generate a recommended policy document using Gemini based on security analysis.
     
     Takes the current policy context and security flags to generate an improved
     policy document that addresses security concerns while maintaining functionality.
+    The result is stored for the current upload after the response is sent.
     """
-    if settings.llm_disabled:
-        raise HTTPException(status_code=503, detail="LLM is disabled by configuration")
-    
     try:
-        policy_context = {
-            "original_policy": {
-                "policy_name": payload.policy.policy_name,
-                "policy_id": payload.policy.policy_id,
-                "statements": payload.policy.statements,
-            },
-            "detected_security_issues": payload.policy.detected_flags,
-            "organization_context": payload.organization_context or "",
-        }
+        policy_context = _llm_context(payload)
         
-        result = policy_service.generate_recommended_policy(policy_context, db)
-        return RecommendedPolicyResponse(
-            policy_document=result["policy_document"],
-            explanation=result["explanation"]
-        )
+        result = await policy_service.generate_recommended_policy(policy_context)
     except RuntimeError as e:
         raise HTTPException(status_code=500, detail=str(e))
+    
+    upload_id = await get_current_upload_id(db)
+    if upload_id:
+        background_tasks.add_task(
+            _store_in_background, policy_service.store_recommended_policy, upload_id, policy_context, result
+        )
+    return RecommendedPolicyResponse(
+        policy_document=result["policy_document"],
+        explanation=result["explanation"]
+    )
 
 
 @router.get("/recommended-policy/{upload_id}/{policy_id}", response_model=RecommendedPolicyResponse)
-async def get_stored_recommended_policy(upload_id: str, policy_id: str, db: Session = Depends(get_db)):
+async def get_stored_recommended_policy(upload_id: UUID, policy_id: str, db: AsyncSession = Depends(get_db)):
     """Get a stored recommended policy for a specific upload and policy."""
-    if settings.llm_disabled:
-        raise HTTPException(status_code=503, detail="LLM is disabled by configuration")
-    
-    result = policy_service.get_stored_recommended_policy(upload_id, policy_id, db)
+    result = await policy_service.get_stored_recommended_policy(upload_id, policy_id, db)
     if not result:
         raise HTTPException(status_code=404, detail="Recommended policy not found")
     
     return result
 
 
+@router.post("/recommended-policy/batch", response_model=Dict[str, RecommendedPolicyResponse])
+async def get_stored_recommended_policies(body: PolicyBatchRequest, db: AsyncSession = Depends(get_db)):
+    """Get stored recommended policies for several policies of an upload, keyed by policy ID."""
+    return await policy_service.get_stored_recommended_policies(body.upload_id, body.policy_ids, db)
+
+
 class RecommendedPolicyPersistRequest(BaseModel):
-    upload_id: str
+    upload_id: UUID
     policy_id: str
     policy_name: str
     policy_document: Dict[str, Any]
@@ -117,12 +187,9 @@ class RecommendedPolicyPersistRequest(BaseModel):
 
 
 @router.post("/recommended-policy/persist", response_model=RecommendedPolicyResponse)
-async def persist_recommended_policy(body: RecommendedPolicyPersistRequest, db: Session = Depends(get_db)):
+async def persist_recommended_policy(body: RecommendedPolicyPersistRequest, db: AsyncSession = Depends(get_db)):
     """Persist a recommended policy to the database."""
-    if settings.llm_disabled:
-        raise HTTPException(status_code=503, detail="LLM is disabled by configuration")
-    
-    return policy_service.persist_recommended_policy(
+    return await policy_service.persist_recommended_policy(
         body.upload_id,
         body.policy_id,
         body.policy_name,
@@ -133,23 +200,12 @@ async def persist_recommended_policy(body: RecommendedPolicyPersistRequest, db:
 
 
 @router.post("/recommended-policy/regenerate", response_model=RecommendedPolicyResponse)
-async def regenerate_recommended_policy(payload: RecommendationRequest, db: Session = Depends(get_db)):
+async def regenerate_recommended_policy(payload: RecommendationRequest, db: AsyncSession = Depends(get_db)):
     """Regenerate and store a recommended policy."""
-    if settings.llm_disabled:
-        raise HTTPException(status_code=503, detail="LLM is disabled by configuration")
-    
     try:
-        policy_context = {
-            "original_policy": {
-                "policy_name": payload.policy.policy_name,
-                "policy_id": payload.policy.policy_id,
-                "statements": payload.policy.statements,
-            },
-            "detected_security_issues": payload.policy.detected_flags,
-            "organization_context": payload.organization_context or "",
-        }
+        policy_context = _llm_context(payload)
         
-        result = policy_service.regenerate_recommended_policy(policy_context, db)
+        result = await policy_service.regenerate_recommended_policy(policy_context, db)
         return RecommendedPolicyResponse(
             policy_document=result["policy_document"],
             explanation=result["explanation"]
@@ -159,59 +215,58 @@ async def regenerate_recommended_policy(payload: RecommendationRequest, db: Sess
 
 
 @router.post("/attack-path", response_model=AttackPathResponse)
-async def generate_attack_path(payload: RecommendationRequest, db: Session = Depends(get_db)):
+async def generate_attack_path(payload: RecommendationRequest, background_tasks: BackgroundTasks,
+                               db: AsyncSession = Depends(get_db)):
     """Generate attack path scenarios showing how an attacker could exploit the policy.
     
     Takes the current policy context and security flags to generate realistic
     attack scenarios with AWS CLI commands demonstrating potential abuse.
+    The result is stored for the current upload after the response is sent, so
+    the response carries no timestamps.
     """
-    if settings.llm_disabled:
-        raise HTTPException(status_code=503, detail="LLM is disabled by configuration")
-    
     try:
-        policy_context = {
-            "policy_context": {
-                "policy_name": payload.policy.policy_name,
-                "policy_id": payload.policy.policy_id,
-                "statements": payload.policy.statements,
-            },
-            "detected_security_issues": payload.policy.detected_flags,
-            "organization_context": payload.organization_context or "",
-        }
+        policy_context = _llm_context(payload)
         
-        return attack_service.generate_attack_path(policy_context, db)
+        result = await attack_service.generate_attack_path(policy_context)
     except RuntimeError as e:
         raise HTTPException(status_code=500, detail=str(e))
+    
+    upload_id = await get_current_upload_id(db)
+    if upload_id:
+        background_tasks.add_task(
+            _store_in_background, attack_service.store_attack_path, upload_id, policy_context, result
+        )
+    return attack_service.generated_response(policy_context, result, upload_id)
 
 
 @router.get("/attack-path/{upload_id}/{policy_id}", response_model=AttackPathResponse)
-async def get_stored_attack_path(upload_id: str, policy_id: str, db: Session = Depends(get_db)):
+async def get_stored_attack_path(upload_id: UUID, policy_id: str, db: AsyncSession = Depends(get_db)):
     """Get a stored attack path analysis for a specific upload and policy."""
-    if settings.llm_disabled:
-        raise HTTPException(status_code=503, detail="LLM is disabled by configuration")
-    
-    result = attack_service.get_stored_attack_path(upload_id, policy_id, db)
+    result = await attack_service.get_stored_attack_path(upload_id, policy_id, db)
     if not result:
         raise HTTPException(status_code=404, detail="Attack path not found")
     
     return result
 
 
+@router.post("/attack-path/batch", response_model=Dict[str, AttackPathResponse])
+async def get_stored_attack_paths(body: PolicyBatchRequest, db: AsyncSession = Depends(get_db)):
+    """Get stored attack path analyses for several policies of an upload, keyed by policy ID."""
+    return await attack_service.get_stored_attack_paths(body.upload_id, body.policy_ids, db)
+
+
 class AttackPathPersistRequest(BaseModel):
-    upload_id: str
+    upload_id: UUID
     policy_id: str
     policy_name: str
-    attack_scenarios: List[Dict[str, Any]]
+    attack_scenarios: List[Any]
     impact_assessment: Optional[str] = None
 
 
 @router.post("/attack-path/persist", response_model=AttackPathResponse)
-async def persist_attack_path(body: AttackPathPersistRequest, db: Session = Depends(get_db)):
+async def persist_attack_path(body: AttackPathPersistRequest, db: AsyncSession = Depends(get_db)):
     """Persist an attack path analysis to the database."""
-    if settings.llm_disabled:
-        raise HTTPException(status_code=503, detail="LLM is disabled by configuration")
-    
-    return attack_service.persist_attack_path(
+    return await attack_service.persist_attack_path(
         body.upload_id,
         body.policy_id,
         body.policy_name,
@@ -222,41 +277,32 @@ async def persist_attack_path(body: AttackPathPersistRequest, db: Session = Depe
 
 
 @router.post("/attack-path/regenerate", response_model=AttackPathResponse)
-async def regenerate_attack_path(payload: RecommendationRequest, db: Session = Depends(get_db)):
+async def regenerate_attack_path(payload: RecommendationRequest, db: AsyncSession = Depends(get_db)):
     """Regenerate and store an attack path analysis."""
-    if settings.llm_disabled:
-        raise HTTPException(status_code=503, detail="LLM is disabled by configuration")
-    
     try:
-        policy_context = {
-            "policy_context": {
-                "policy_name": payload.policy.policy_name,
-                "policy_id": payload.policy.policy_id,
-                "statements": payload.policy.statements,
-            },
-            "detected_security_issues": payload.policy.detected_flags,
-            "organization_context": payload.organization_context or "",
-        }
+        policy_context = _llm_context(payload)
         
-        return attack_service.regenerate_attack_path(policy_context, db)
+        return await attack_service.regenerate_attack_path(policy_context, db)
     except RuntimeError as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @router.get("/recommendations/{upload_id}/{policy_id}", response_model=LLMRecommendationResponse)
-async def get_recommendation(upload_id: str, policy_id: str, db: Session = Depends(get_db)):
-    if settings.llm_disabled:
-        raise HTTPException(status_code=503, detail="LLM is disabled by configuration")
-    
-    result = policy_service.get_stored_recommendation(upload_id, policy_id, db)
+async def get_recommendation(upload_id: UUID, policy_id: str, db: AsyncSession = Depends(get_db)):
+    result = await policy_service.get_stored_recommendation(upload_id, policy_id, db)
     if not result:
         raise HTTPException(status_code=404, detail="Recommendation not found")
     
     return result
 
 
+@router.post("/recommendations/batch", response_model=Dict[str, LLMRecommendationResponse])
+async def get_recommendations(body: PolicyBatchRequest, db: AsyncSession = Depends(get_db)):
+    return await policy_service.get_stored_recommendations(body.upload_id, body.policy_ids, db)
+
+
 class PersistRequest(BaseModel):
-    upload_id: str
+    upload_id: UUID
     policy_id: str
     policy_name: str
     recommendations: List[str]
@@ -264,11 +310,8 @@ class PersistRequest(BaseModel):
 
 
 @router.post("/recommendations/persist", response_model=LLMRecommendationResponse)
-async def persist_recommendation(body: PersistRequest, db: Session = Depends(get_db)):
-    if settings.llm_disabled:
-        raise HTTPException(status_code=503, detail="LLM is disabled by configuration")
-    
-    return policy_service.persist_recommendation(
+async def persist_recommendation(body: PersistRequest, db: AsyncSession = Depends(get_db)):
+    return await policy_service.persist_recommendation(
         body.upload_id,
         body.policy_id,
         body.policy_name,
@@ -279,21 +322,79 @@ async def persist_recommendation(body: PersistRequest, db: Session = Depends(get
 
 
 @router.post("/recommendations/regenerate", response_model=LLMRecommendationResponse)
-async def regenerate_recommendations(payload: RecommendationRequest, db: Session = Depends(get_db)):
-    if settings.llm_disabled:
-        raise HTTPException(status_code=503, detail="LLM is disabled by configuration")
+async def regenerate_recommendations(payload: RecommendationRequest, db: AsyncSession = Depends(get_db)):
+    try:
+        policy_context = _llm_context(payload)
+        
+        recommendation = await policy_service.regenerate_recommendations(policy_context, db)
+    except RuntimeError as e:
+        raise HTTPException(status_code=500, detail=str(e))
     
+    if recommendation is None:
+        raise HTTPException(status_code=409, detail="No current upload to store recommendations for")
+    return recommendation
+
+
+class RecommendationBatchRequest(BaseModel):
+    items: List[RecommendationRequest]
+
+
+class RecommendationBatchResponse(BaseModel):
+    results: Dict[str, LLMRecommendationResponse]
+    errors: Dict[str, str] = {}
+
+
+@router.post("/recommendations/regenerate/batch", response_model=RecommendationBatchResponse)
+async def regenerate_recommendations_batch(body: RecommendationBatchRequest, db: AsyncSession = Depends(get_db)):
+    """Regenerate and store recommendations for several policies concurrently.
+
+    Policies whose generation fails are reported under ``errors`` by policy ID;
+    the rest are stored and returned under ``results``. Responds with 409, before
+    calling Gemini, when there is no current upload to store them under.
+    """
+    policy_contexts = [_llm_context(payload) for payload in body.items]
+    
+    outcome = await policy_service.regenerate_recommendations_many(policy_contexts, db)
+    if outcome is None:
+        raise HTTPException(status_code=409, detail="No current upload to store recommendations for")
+    
+    results, errors = outcome
+    return RecommendationBatchResponse(results=results, errors=errors)
+
+
+class PolicyAnalysisResponse(BaseModel):
+    recommendations: RecommendationResponse
+    recommended_policy: RecommendedPolicyResponse
+    attack_path: AttackPathResponse
+
+
+@router.post("/analyze", response_model=PolicyAnalysisResponse)
+async def analyze_policy(payload: RecommendationRequest, db: AsyncSession = Depends(get_db)):
+    """Generate recommendations, a recommended policy and attack paths in one call.
+
+    The three Gemini calls run concurrently, and their results are stored in a
+    single transaction when there is a current upload.
+    """
+    try:
+        policy_context = _llm_context(payload)
+        
+        return await policy_service.analyze_policy_full(policy_context, db)
+    except RuntimeError as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/analyze/regenerate", response_model=PolicyAnalysisResponse)
+async def regenerate_policy_analysis(payload: RecommendationRequest, db: AsyncSession = Depends(get_db)):
+    """Regenerate and store all three analyses concurrently, bypassing the LLM result cache."""
     try:
-        policy_context = {
-            "policy_name": payload.policy.policy_name,
-            "policy_id": payload.policy.policy_id,
-            "statements": payload.policy.statements,
-            "detected_flags": payload.policy.detected_flags,
-            "organization_context": payload.organization_context or "",
-        }
+        policy_context = _llm_context(payload)
         
-        return policy_service.regenerate_recommendations(policy_context, db)
+        return await policy_service.analyze_policy_full(policy_context, db, refresh=True)
     except RuntimeError as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get("/cache/stats")
+async def cache_stats():
+    """Report LLM result cache hit/miss counters."""
+    return llm_cache.stats()
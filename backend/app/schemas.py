@@ -1,8 +1,11 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
 from typing import Dict, List, Any, Optional
 from datetime import datetime
+from uuid import UUID
 
 # IAM Data Structures
+# Inline policy and version lists carry whole policy documents; they are stored
+# and returned as is, so their items are not validated element by element
 class IAMUser(BaseModel):
     UserId: str
     UserName: str
@@ -10,7 +13,7 @@ class IAMUser(BaseModel):
     CreateDate: str
     AttachedManagedPolicies: List[Dict[str, str]]
     GroupList: List[str]
-    UserPolicyList: List[Dict[str, Any]]
+    UserPolicyList: List[Any]
     Tags: List[Dict[str, str]]
 
 class IAMRole(BaseModel):
@@ -20,7 +23,7 @@ class IAMRole(BaseModel):
     CreateDate: str
     AssumeRolePolicyDocument: Dict[str, Any]
     AttachedManagedPolicies: List[Dict[str, str]]
-    RolePolicyList: List[Dict[str, Any]]
+    RolePolicyList: List[Any]
     Tags: List[Dict[str, str]]
 
 class IAMPolicy(BaseModel):
@@ -29,7 +32,7 @@ class IAMPolicy(BaseModel):
     Arn: str
     CreateDate: str
     DefaultVersionId: str
-    PolicyVersionList: List[Dict[str, Any]]
+    PolicyVersionList: List[Any]
     AttachmentCount: int
     IsAttachable: bool
     Description: str
@@ -40,7 +43,7 @@ class IAMGroup(BaseModel):
     Arn: str
     CreateDate: str
     AttachedManagedPolicies: List[Dict[str, str]]
-    GroupPolicyList: List[Dict[str, Any]]
+    GroupPolicyList: List[Any]
 
 class ProcessedIAMData(BaseModel):
     users: Dict[str, IAMUser]
@@ -58,17 +61,16 @@ class UploadCreate(UploadBase):
     data: ProcessedIAMData
 
 class Upload(UploadBase):
-    id: str
+    id: UUID
     uploaded_at: datetime
 
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 class UploadMetadata(BaseModel):
-    id: str
+    id: UUID
     name: str
     original_filename: str
-    uploaded_at: str
+    uploaded_at: datetime
     size: int
 
 # Raw IAM data for processing
@@ -80,12 +82,12 @@ class RawIAMData(BaseModel):
 
 # API Response schemas
 class CurrentUploadResponse(BaseModel):
-    upload_id: Optional[str]
+    upload_id: Optional[UUID]
 
 
 # LLM Recommendations
 class LLMRecommendationBase(BaseModel):
-    upload_id: str
+    upload_id: UUID
     policy_id: str
     policy_name: str
     recommendations: List[str]
@@ -93,7 +95,7 @@ class LLMRecommendationBase(BaseModel):
 
 
 class LLMRecommendationCreate(BaseModel):
-    upload_id: str
+    upload_id: UUID
     policy_id: str
     policy_name: str
     recommendations: List[str]
@@ -101,16 +103,15 @@ class LLMRecommendationCreate(BaseModel):
 
 
 class LLMRecommendationResponse(LLMRecommendationBase):
-    created_at: Optional[str] = None
-    updated_at: Optional[str] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
 
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 
 # Recommended Policy schemas
 class RecommendedPolicyBase(BaseModel):
-    upload_id: str
+    upload_id: UUID
     policy_id: str
     policy_name: str
     policy_document: Dict[str, Any]
@@ -118,7 +119,7 @@ class RecommendedPolicyBase(BaseModel):
 
 
 class RecommendedPolicyCreate(BaseModel):
-    upload_id: str
+    upload_id: UUID
     policy_id: str
     policy_name: str
     policy_document: Dict[str, Any]
@@ -126,33 +127,33 @@ class RecommendedPolicyCreate(BaseModel):
 
 
 class RecommendedPolicyResponse(RecommendedPolicyBase):
-    created_at: Optional[str] = None
-    updated_at: Optional[str] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
 
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 
 # Attack Path schemas
 class AttackPathBase(BaseModel):
-    upload_id: str
+    upload_id: UUID
     policy_id: str
     policy_name: str
-    attack_scenarios: List[Dict[str, Any]]
+    attack_scenarios: List[Any]
     impact_assessment: Optional[str] = None
 
 
 class AttackPathCreate(BaseModel):
-    upload_id: str
+    upload_id: UUID
     policy_id: str
     policy_name: str
-    attack_scenarios: List[Dict[str, Any]]
+    attack_scenarios: List[Any]
     impact_assessment: Optional[str] = None
 
 
 class AttackPathResponse(AttackPathBase):
-    created_at: Optional[str] = None
-    updated_at: Optional[str] = None
+    # None when there was no current upload to store the analysis under
+    upload_id: Optional[UUID] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
 
-    class Config:
-        from_attributes = True
\ No newline at end of file
+    model_config = ConfigDict(from_attributes=True)
\ No newline at end of file
@@ -0,0 +1 @@
+# Development helpers; not used by the application at runtime
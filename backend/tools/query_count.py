@@ -0,0 +1,48 @@
+"""
+Query Count Helper
+
+Records the SQL statements executed while a block runs, so callers can
+assert how many round trips a code path makes and catch N+1 regressions.
+Kept outside the app package so it is not shipped in the image; run from
+the backend directory so ``app`` is importable.
+"""
+
+from contextlib import contextmanager
+from typing import Iterator, List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.database import engine as default_engine
+
+
+@contextmanager
+def count_queries(engine: Optional[AsyncEngine | Engine] = None) -> Iterator[List[str]]:
+    """
+    Collect the statements executed on an engine inside the ``with`` block.
+    
+    Args:
+        engine: Engine to watch; defaults to the application engine
+        
+    Yields:
+        List that receives each executed SQL string, in order
+        
+    Example:
+        with count_queries() as queries:
+            await get_user_by_id(db, user_id)
+        assert len(queries) == 1
+    """
+    engine = engine or default_engine
+    # Cursor events fire on the sync engine underneath an AsyncEngine
+    target = engine.sync_engine if isinstance(engine, AsyncEngine) else engine
+    queries: List[str] = []
+    
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        queries.append(statement)
+    
+    event.listen(target, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield queries
+    finally:
+        event.remove(target, "before_cursor_execute", before_cursor_execute)